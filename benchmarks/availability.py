@@ -0,0 +1,96 @@
+"""Expire silent devices among thousands with a single timer.
+
+Registers many devices, keeps half of them talking and checks that
+exactly the silent half expires, stays expired while only our own
+thermostat commands come back from the broker, and recovers on its next
+state message. Reports
+the per-message cost of recording last-seen times and the cost of the
+expiry sweeps.
+
+Run from the repository root:
+
+    python benchmarks/availability.py [devices]
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from custom_components.lanbon_switch.availability import LanbonAvailability  # noqa: E402
+from custom_components.lanbon_switch.dispatcher import LanbonDispatcher  # noqa: E402
+
+TIMEOUT = 0.3
+ROUNDS = 10
+
+
+async def main(devices: int):
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        dispatcher = LanbonDispatcher(hass)
+        availability = LanbonAvailability(hass, TIMEOUT)
+        availability.async_setup(dispatcher)
+
+        changes = {}
+        device_ids = [f"D{index:011X}" for index in range(devices)]
+        for device_id_raw in device_ids:
+            changes[device_id_raw] = 0
+
+            def changed(device_id_raw=device_id_raw):
+                changes[device_id_raw] += 1
+
+            availability.async_register(device_id_raw, changed)
+
+        chatty = device_ids[::2]
+        messages = [
+            SimpleNamespace(topic=f"homeassistant/{device_id_raw}/switch/{device_id_raw}-01/state", payload=b"ON")
+            for device_id_raw in chatty
+        ]
+
+        dispatch_time = 0.0
+        for _ in range(ROUNDS):
+            start = time.perf_counter()
+            for msg in messages:
+                dispatcher.async_dispatch(msg)
+            dispatch_time += time.perf_counter() - start
+            await asyncio.sleep(TIMEOUT / 4)
+
+        await asyncio.sleep(TIMEOUT / 4)
+        silent = device_ids[1::2]
+        assert all(availability.is_available(device_id_raw) for device_id_raw in chatty)
+        assert not any(availability.is_available(device_id_raw) for device_id_raw in silent)
+        assert availability.unavailable == len(silent)
+
+        # The thermostat wildcard also delivers our own commands
+        for device_id_raw in silent:
+            dispatcher.async_dispatch(
+                SimpleNamespace(topic=f"homeassistant/{device_id_raw}/thermostat/{device_id_raw}-01/modeSet", payload=b"0")
+            )
+        assert availability.unavailable == len(silent)
+
+        start = time.perf_counter()
+        for device_id_raw in silent:
+            dispatcher.async_dispatch(
+                SimpleNamespace(topic=f"homeassistant/{device_id_raw}/switch/{device_id_raw}-01/state", payload=b"ON")
+            )
+        recover_time = time.perf_counter() - start
+        assert availability.unavailable == 0
+        assert all(changes[device_id_raw] == 2 for device_id_raw in silent)
+        assert not any(changes[device_id_raw] for device_id_raw in chatty)
+
+        print(f"devices:              {devices}")
+        print(f"messages:             {len(messages) * ROUNDS}")
+        print(f"per message:          {dispatch_time / (len(messages) * ROUNDS) * 1e6:.2f} µs")
+        print(f"recover {len(silent)} devices: {recover_time * 1000:.1f} ms")
+        print(f"heap entries:         {len(availability._heap)}")
+        availability.async_shutdown()
+        await hass.async_stop(force=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000))
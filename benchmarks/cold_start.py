@@ -0,0 +1,114 @@
+"""Measure cold start from a large stored registry.
+
+Writes a version 2 registry to a temporary config directory, then times
+loading it on its own and the integration's setup against the fake
+broker until every stored channel's entity has been added to Home
+Assistant through the real entity platforms.
+
+Run from the repository root:
+
+    python benchmarks/cold_start.py [panels]
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_mqtt import (  # noqa: E402
+    FakeBroker,
+    async_create_hass,
+    async_start_integration,
+    async_stop_integration,
+)
+
+from custom_components.lanbon_switch.storage import (  # noqa: E402
+    STORAGE_KEY,
+    STORAGE_VERSION,
+    LanbonStorage,
+    empty_registry,
+)
+
+GANGS = 4
+# Probing thousands of silent devices isn't part of startup
+OPTIONS = {"sync_timeout": 3600}
+
+
+def build_registry(panels: int) -> dict:
+    devices = empty_registry()
+    for index in range(panels):
+        device_id_raw = f"D{index:011X}"
+        device_id = device_id_raw.lower()
+        if index % 10 == 9:
+            thermostat_id_raw = f"T{index:011X}"
+            base = f"homeassistant/{device_id_raw}/thermostat/{thermostat_id_raw}/"
+            devices["thermostat"][device_id] = {
+                thermostat_id_raw.lower(): {
+                    "device_id_raw": device_id_raw,
+                    "thermostat_id_raw": thermostat_id_raw,
+                    "temperature_state_topic": base + "temperatureState",
+                    "temperature_detect_topic": base + "temperatureDetect",
+                    "mode_state_topic": base + "modeState",
+                    "temperature_set_topic": base + "temperatureSet",
+                    "mode_set_topic": base + "modeSet",
+                }
+            }
+            continue
+        switches = devices["switch"].setdefault(device_id, {})
+        for gang in range(1, GANGS + 1):
+            switch_id_raw = f"{device_id_raw}-0{gang}"
+            switches[switch_id_raw.lower()] = {
+                "device_id_raw": device_id_raw,
+                "switch_id_raw": switch_id_raw,
+                "set_topic": f"homeassistant/{device_id_raw}/switch/{switch_id_raw}/set",
+            }
+    return devices
+
+
+async def main(panels: int):
+    devices = build_registry(panels)
+    channels = sum(len(device) for kind in devices.values() for device in kind.values())
+    with tempfile.TemporaryDirectory() as config_dir:
+        os.makedirs(os.path.join(config_dir, ".storage"))
+        with open(os.path.join(config_dir, ".storage", STORAGE_KEY), "w") as file:
+            json.dump(
+                {
+                    "version": STORAGE_VERSION,
+                    "minor_version": 1,
+                    "key": STORAGE_KEY,
+                    "data": {"devices": devices},
+                },
+                file,
+            )
+
+        hass = await async_create_hass(config_dir)
+        broker = FakeBroker(hass)
+
+        start = time.perf_counter()
+        await LanbonStorage(hass).async_load()
+        load = time.perf_counter() - start
+
+        # Setup loads the registry again and only returns once the
+        # platforms have added their entities to Home Assistant
+        start = time.perf_counter()
+        entry = await async_start_integration(hass, broker, OPTIONS)
+        ready = time.perf_counter() - start
+        platforms = hass.config_entries.platforms
+        added = sum(len(platforms[domain].entities) for domain in ("switch", "climate"))
+        assert added == channels, (added, channels)
+        assert all(entity.available for entity in hass.config_entries.entities())
+
+        print(f"panels:            {panels}")
+        print(f"entities restored: {added}")
+        print(f"registry load:     {load * 1000:.1f} ms")
+        print(f"entities added:    {ready * 1000:.1f} ms")
+        await async_stop_integration(hass, broker, entry)
+        await hass.async_stop(force=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_500))
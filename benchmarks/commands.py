@@ -0,0 +1,216 @@
+"""Exercise the per-panel command scheduler against a fake MQTT publisher.
+
+Checks that gang-4 sequences are never interleaved with other publishes to
+the same panel, that a gang-1 command issued together with a gang-4 one
+leaves gang 1 in the commanded state, and that ON followed by OFF for the
+same gang is merged into one OFF. Reports end-to-end command latency under
+concurrent load.
+
+Against simulated panels that echo their state, it also checks that gang 4
+switched on and then off leaves gang 1 as it was, whether the second
+command arrives while the first toggle cycle runs or just after it, with
+the panel's echoes still in flight, and that gang 4 switched on leaves an
+ON gang 1 ON when gang 1's entity is disabled.
+
+Run from the repository root:
+
+    python benchmarks/commands.py [panels]
+"""
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_mqtt import (  # noqa: E402
+    FakeBroker,
+    async_create_hass,
+    async_start_integration,
+    async_stop_integration,
+)
+from load import SimulatedSwitchPanel  # noqa: E402
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers import entity_registry as er  # noqa: E402
+
+from custom_components.lanbon_switch.commands import (  # noqa: E402
+    LanbonCommandScheduler,
+    SwitchCommand,
+)
+from custom_components.lanbon_switch.const import DOMAIN  # noqa: E402
+
+# Echo latency of the simulated panels
+ECHO_LATENCY = 0.03
+# Seconds between gang 4's ON and OFF commands, None to send OFF once ON returns
+GANG4_GAPS = (None, 0.05)
+
+
+class FakePublisher:
+    def __init__(self):
+        self.published: dict[str, list[tuple[str, str]]] = {}
+
+    async def __call__(self, topic, payload):
+        device_id_raw = topic.split("/")[1]
+        self.published.setdefault(device_id_raw, []).append((topic, payload))
+        await asyncio.sleep(0)
+
+
+def topic(device_id_raw, gang):
+    return f"homeassistant/{device_id_raw}/switch/{device_id_raw}-0{gang}/set"
+
+
+async def timed(scheduler, device_id_raw, gang, state, latencies):
+    command = SwitchCommand(topic(device_id_raw, gang), state)
+    if gang == 4:
+        command = SwitchCommand(
+            topic(device_id_raw, 4),
+            state,
+            f"{device_id_raw}-01",
+            topic(device_id_raw, 1),
+            lambda: "off",
+        )
+    start = time.perf_counter()
+    result = await scheduler.async_set(device_id_raw, f"{device_id_raw}-0{gang}", command)
+    latencies.append(time.perf_counter() - start)
+    return result
+
+
+async def gang4_on_off():
+    """Switch gang 4 on and off on echoing panels; gang 1 must keep its state."""
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await async_create_hass(config_dir)
+        broker = FakeBroker(hass)
+        panels = [
+            SimulatedSwitchPanel(broker, f"LB{index:010X}", 4, ECHO_LATENCY, 0)
+            for index in range(len(GANG4_GAPS))
+        ]
+        # Gang 1 is ON and its entity disabled on the last panel
+        disabled = SimulatedSwitchPanel(broker, f"LB{len(panels):010X}", 4, ECHO_LATENCY, 0)
+        disabled.states[f"{disabled.device_id_raw}-01"] = "ON"
+        er.async_get(hass).async_get_or_create(
+            "switch",
+            DOMAIN,
+            f"lanbon_switch_{disabled.device_id_raw.lower()}_{disabled.device_id_raw.lower()}-01",
+            disabled_by=er.RegistryEntryDisabler.USER,
+        )
+        panels.append(disabled)
+        gang1_sent = {panel.device_id_raw: [] for panel in panels}
+        for panel in panels:
+            await panel.async_connect()
+            await broker.async_subscribe(
+                hass,
+                f"homeassistant/{panel.device_id_raw}/switch/{panel.device_id_raw}-01/set",
+                lambda msg: gang1_sent[msg.topic.split("/")[1]].append(msg.payload),
+            )
+        entry = await async_start_integration(hass, broker)
+        registry = hass.data[DOMAIN]["registry"]
+        gang4_topics = [panel.state_topic(f"{panel.device_id_raw}-04") for panel in panels]
+        for panel in panels:
+            panel.announce()
+        while any(
+            registry.by_topic(topic) is None or registry.by_topic(topic).entity is None
+            for topic in gang4_topics
+        ):
+            await asyncio.sleep(0.01)
+
+        for gap, panel, topic in zip(GANG4_GAPS, panels, gang4_topics):
+            entity = registry.by_topic(topic).entity
+            if gap is None:
+                await entity.async_turn_on()
+                await entity.async_turn_off()
+            else:
+                turn_on = hass.async_create_task(entity.async_turn_on())
+                await asyncio.sleep(gap)
+                await entity.async_turn_off()
+                await turn_on
+            await panel.async_wait_idle()
+            await hass.async_block_till_done()
+            sent = gang1_sent[panel.device_id_raw]
+            assert panel.states[f"{panel.device_id_raw}-01"] == "OFF", (gap, sent)
+
+        assert registry.by_topic(disabled.state_topic(f"{disabled.device_id_raw}-01")).entity is None
+        await registry.by_topic(gang4_topics[-1]).entity.async_turn_on()
+        await disabled.async_wait_idle()
+        await hass.async_block_till_done()
+        sent = gang1_sent[disabled.device_id_raw]
+        assert disabled.states[f"{disabled.device_id_raw}-01"] == "ON", sent
+
+        await async_stop_integration(hass, broker, entry)
+        await hass.async_stop(force=True)
+
+
+async def main(panels: int):
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        publisher = FakePublisher()
+        scheduler = LanbonCommandScheduler(hass, publisher)
+        latencies = []
+        panel_ids = [f"D{index:011X}" for index in range(panels)]
+
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(
+                coro
+                for device_id_raw in panel_ids
+                for coro in (
+                    # A scene switching gang 1 and gang 4 together
+                    timed(scheduler, device_id_raw, 1, "ON", latencies),
+                    timed(scheduler, device_id_raw, 4, "ON", latencies),
+                    # ON then OFF inside the window for gang 2
+                    timed(scheduler, device_id_raw, 2, "ON", latencies),
+                    timed(scheduler, device_id_raw, 2, "OFF", latencies),
+                )
+            )
+        )
+        elapsed = time.perf_counter() - start
+
+        for index, device_id_raw in enumerate(panel_ids):
+            published = publisher.published[device_id_raw]
+            gang1 = [payload for sent, payload in published if sent == topic(device_id_raw, 1)]
+            gang2 = [payload for sent, payload in published if sent == topic(device_id_raw, 2)]
+            gang4_at = [i for i, (sent, _) in enumerate(published) if sent == topic(device_id_raw, 4)]
+            assert gang1[-1] == "ON", (device_id_raw, published)
+            assert gang2 == ["OFF"], (device_id_raw, published)
+            # The gang-4 sequence occupies a contiguous run of publishes
+            assert gang4_at[-1] - gang4_at[0] == 2, (device_id_raw, published)
+            assert results[index * 4 + 2] == results[index * 4 + 3] == "OFF"
+
+        # Whole-floor off: every gang of every panel in one bulk call
+        bulk = []
+        for device_id_raw in panel_ids:
+            for gang in range(1, 5):
+                command = SwitchCommand(topic(device_id_raw, gang), "OFF")
+                if gang == 4:
+                    command = SwitchCommand(
+                        topic(device_id_raw, 4),
+                        "OFF",
+                        f"{device_id_raw}-01",
+                        topic(device_id_raw, 1),
+                        lambda: "off",
+                    )
+                bulk.append((device_id_raw, f"{device_id_raw}-0{gang}", command))
+        bulk_start = time.perf_counter()
+        bulk_results = await scheduler.async_set_many(bulk)
+        bulk_elapsed = time.perf_counter() - bulk_start
+        assert bulk_results == ["OFF"] * len(bulk)
+
+        latencies.sort()
+        print(f"panels:            {panels}")
+        print(f"commands:          {len(latencies)}")
+        print(f"wall clock:        {elapsed * 1000:.1f} ms")
+        print(f"latency p50:       {statistics.median(latencies) * 1000:.1f} ms")
+        print(f"latency p95:       {latencies[int(len(latencies) * 0.95)] * 1000:.1f} ms")
+        print(f"latency max:       {latencies[-1] * 1000:.1f} ms")
+        print(f"bulk off channels: {len(bulk)}")
+        print(f"bulk off duration: {bulk_elapsed * 1000:.1f} ms")
+        await hass.async_stop(force=True)
+    await gang4_on_off()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
@@ -0,0 +1,86 @@
+"""Replay a burst of retained discovery messages with duplicates.
+
+Feeds 10k channels, each announced several times and in shuffled order,
+through the dispatcher and discovery pipeline. Asserts exactly one entity
+per channel and a bounded number of ``async_add_entities`` calls.
+
+Run from the repository root:
+
+    python benchmarks/discovery_burst.py [channels]
+"""
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_mqtt import async_setup_discovery  # noqa: E402
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from custom_components.lanbon_switch import climate, switch  # noqa: E402,F401
+from custom_components.lanbon_switch.storage import LanbonStorage  # noqa: E402
+
+DUPLICATES = 3
+BATCH_DELAY = 0.05
+
+
+async def main(channels: int):
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        store = LanbonStorage(hass, save_delay=1)
+        added = {"switch": [], "thermostat": []}
+        add_calls = 0
+
+        def add_to(kind):
+            def add_entities(entities, update_before_add=False):
+                nonlocal add_calls
+                add_calls += 1
+                added[kind].extend(entities)
+
+            return add_entities
+
+        dispatcher, discovery = async_setup_discovery(
+            hass, store, {kind: add_to(kind) for kind in added}, BATCH_DELAY
+        )
+
+        messages = []
+        for index in range(channels):
+            device_id_raw = f"D{index // 4:011X}"
+            if index % 40 == 39:
+                topic = f"homeassistant/{device_id_raw}/thermostat/T{index:011X}/modeState"
+            else:
+                topic = f"homeassistant/{device_id_raw}/switch/{device_id_raw}-0{index % 4 + 1}/state"
+            messages.extend(SimpleNamespace(topic=topic, payload=b"ON") for _ in range(DUPLICATES))
+        random.shuffle(messages)
+
+        start = time.perf_counter()
+        for position, msg in enumerate(messages):
+            dispatcher.async_dispatch(msg)
+            if position % 500 == 0:
+                # Messages arrive across many loop iterations
+                await asyncio.sleep(0)
+        replayed = time.perf_counter() - start
+        await asyncio.sleep(BATCH_DELAY * 2)
+        await hass.async_block_till_done()
+
+        entities = added["switch"] + added["thermostat"]
+        unique_ids = {entity.unique_id for entity in entities}
+        assert len(entities) == len(unique_ids) == channels, (len(entities), channels)
+        assert add_calls <= 2 * discovery.batches, add_calls
+
+        print(f"messages replayed: {len(messages)}")
+        print(f"replay time:       {replayed * 1000:.1f} ms")
+        print(f"entities created:  {len(entities)}")
+        print(f"add calls:         {add_calls} in {discovery.batches} batches")
+        await store.async_flush()
+        print(f"registry writes:   {store.write_count}")
+        await hass.async_stop(force=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000))
@@ -0,0 +1,78 @@
+"""Measure per-message dispatch cost of the shared MQTT router.
+
+Entities are spread over a growing number of topic prefixes, one of them
+the default ``homeassistant/`` and the others two segments deep. Each
+device is routed to a ``LanbonPanel`` that fans out to its four gangs.
+
+Run from the repository root:
+
+    python benchmarks/dispatch.py
+"""
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from custom_components.lanbon_switch.const import DOMAIN  # noqa: E402
+from custom_components.lanbon_switch.dispatcher import LanbonDispatcher  # noqa: E402
+from custom_components.lanbon_switch.panel import LanbonPanel  # noqa: E402
+from custom_components.lanbon_switch.registry import Panel  # noqa: E402
+
+SIZES = (10, 1_000, 10_000)
+PREFIXES = (1, 10, 100)
+MESSAGES = 100_000
+
+
+def bench(entities: int, prefix_count: int) -> float:
+    prefixes = ["homeassistant/"] + [f"building-{index}/lanbon/" for index in range(1, prefix_count)]
+    dispatcher = LanbonDispatcher(hass=None, prefixes=prefixes)
+    hass = SimpleNamespace(data={DOMAIN: {"dispatcher": dispatcher}})
+    panels = {}
+    received = 0
+
+    def handler(msg):
+        nonlocal received
+        received += 1
+
+    def discover(msg, prefix, device_id_raw, channel_id_raw):
+        pass
+
+    dispatcher.async_register_discovery("switch", "state", discover)
+    messages = []
+    for index in range(entities):
+        device_id_raw = f"D{index // 4:011X}"
+        switch_id_raw = f"{device_id_raw}-0{index % 4 + 1}"
+        prefix = prefixes[index // 4 % prefix_count]
+        panel = panels.get(device_id_raw)
+        if panel is None:
+            panel = panels[device_id_raw] = LanbonPanel(hass, Panel("switch", device_id_raw, prefix=prefix))
+        panel.async_register(switch_id_raw, "state", handler)
+        messages.append(
+            SimpleNamespace(
+                topic=f"{prefix}{device_id_raw}/switch/{switch_id_raw}/state",
+                payload=b"ON",
+            )
+        )
+
+    stream = [messages[i % entities] for i in range(MESSAGES)]
+    start = time.perf_counter()
+    for msg in stream:
+        dispatcher.async_dispatch(msg)
+    elapsed = time.perf_counter() - start
+    assert received == MESSAGES
+    return elapsed / MESSAGES
+
+
+def main():
+    for prefix_count in PREFIXES:
+        for entities in SIZES:
+            print(
+                f"{prefix_count:>3} prefixes {entities:>6} entities: "
+                f"{bench(entities, prefix_count) * 1e9:8.0f} ns/message"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Evict stale devices at startup and cap the registry by last-seen order.
+
+Discovers a fleet through the integration and restarts it with half of
+the stored devices last seen 60 days ago, with probing turned off. Checks
+that the restart publishes nothing and keeps them all, since time Home Assistant was down doesn't count as silence,
+and that once the integration has itself run past the TTL exactly those
+are gone from the registry, storage and entity registry. Then lowers the
+cap and checks that the least recently seen devices are the ones evicted,
+and that a device deleted in the UI is forgotten as well.
+
+Run from the repository root:
+
+    python benchmarks/eviction.py [panels]
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_mqtt import (  # noqa: E402
+    FakeBroker,
+    async_create_hass,
+    async_start_integration,
+    async_stop_integration,
+)
+from homeassistant.helpers import device_registry as dr, entity_registry as er  # noqa: E402
+
+from custom_components.lanbon_switch import async_remove_config_entry_device  # noqa: E402
+
+from custom_components.lanbon_switch.const import DOMAIN  # noqa: E402
+from custom_components.lanbon_switch.storage import LanbonStorage  # noqa: E402
+
+GANGS = 3
+DAY = 86400
+
+
+def _entity_count(hass) -> int:
+    return sum(
+        1
+        for entry in er.async_get(hass).entities.values()
+        if entry.platform == DOMAIN and entry.domain == "switch"
+    )
+
+
+async def main(panels: int):
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await async_create_hass(config_dir)
+        broker = FakeBroker(hass)
+        options = {"save_delay": 0, "sync_rate": 100_000, "sync_timeout": 0.1, "sync_concurrency": 1000}
+        entry = await async_start_integration(hass, broker, options)
+        for index in range(panels):
+            device_id_raw = f"D{index:011X}"
+            for gang in range(1, GANGS + 1):
+                broker.async_inject(
+                    f"homeassistant/{device_id_raw}/switch/{device_id_raw}-0{gang}/state", "OFF"
+                )
+        while hass.data[DOMAIN]["discovery"].batches == 0:
+            await asyncio.sleep(0.05)
+        await hass.async_block_till_done()
+        await async_stop_integration(hass, broker, entry)
+        await hass.async_block_till_done()
+        entities = _entity_count(hass)
+
+        # Age every other device while Home Assistant is "down"; a restart
+        # starts without the registry a reload would keep in memory
+        hass.data.pop(DOMAIN)
+        store = LanbonStorage(hass)._store
+        data = await store.async_load()
+        now = time.time()
+        for index, device_id in enumerate(sorted(data["last_seen"]["switch"])):
+            data["last_seen"]["switch"][device_id] = now - (60 * DAY if index % 2 else index)
+        await store.async_save(data)
+
+        # Nothing answers the probes; hydrate only, which must not publish
+        published = broker.published
+        entry = await async_start_integration(hass, broker, {**options, "sync_concurrency": 0})
+        await hass.async_block_till_done()
+        while hass.data[DOMAIN]["sync"].summary is None:
+            await asyncio.sleep(0.05)
+        summary = hass.data[DOMAIN]["sync"].summary
+        assert summary["probed"] == 0 and summary["silent"] == panels * GANGS, summary
+        assert broker.published == published, broker.published - published
+        registry = hass.data[DOMAIN]["registry"]
+        assert registry.panel_count == panels, registry.panel_count
+        assert _entity_count(hass) == entities, _entity_count(hass)
+
+        # As if the integration had been running for 60 days since
+        eviction = hass.data[DOMAIN]["eviction"]
+        eviction._started -= 60 * DAY
+        start = time.perf_counter()
+        eviction.async_sweep()
+        ttl_sweep = time.perf_counter() - start
+        await hass.async_block_till_done()
+        kept = panels - panels // 2
+        assert registry.panel_count == kept, registry.panel_count
+        assert _entity_count(hass) == kept * GANGS, _entity_count(hass)
+
+        # Lower the cap: the oldest of the survivors go first
+        eviction.max_devices = kept // 2
+        start = time.perf_counter()
+        evicted = eviction.async_sweep()
+        sweep = time.perf_counter() - start
+        await hass.async_block_till_done()
+        survivors = sorted(panel.last_seen for panel in registry.panels())
+        assert evicted == kept - kept // 2
+        assert registry.panel_count == kept // 2
+        assert survivors[0] >= now - kept, survivors[0]
+
+        # Delete one device the way the UI does: ask the integration, then
+        # detach the device from the entry
+        panel = next(iter(registry.panels()))
+        device_registry = dr.async_get(hass)
+        device = device_registry.async_get_device(identifiers={(DOMAIN, panel.device_id)})
+        assert await async_remove_config_entry_device(hass, entry, device)
+        device_registry.async_update_device(device.id, remove_config_entry_id=entry.entry_id)
+        await hass.async_block_till_done()
+        assert registry.panel_count == kept // 2 - 1, registry.panel_count
+        assert panel.route_id not in hass.data[DOMAIN]["panels"]
+        assert _entity_count(hass) == (kept // 2 - 1) * GANGS, _entity_count(hass)
+
+        await async_stop_integration(hass, broker, entry)
+        await hass.async_block_till_done()
+        stored = await store.async_load()
+        assert len(stored["devices"]["switch"]) == kept // 2 - 1
+
+        print(f"entities discovered:  {entities}")
+        print(f"restart kept:         {panels} devices, {panels // 2} stale")
+        print(f"TTL sweep of {panels // 2}:     {ttl_sweep * 1000:.1f} ms")
+        print(f"entities after TTL:   {kept * GANGS}")
+        print(f"cap sweep of {evicted}:     {sweep * 1000:.1f} ms")
+        print(f"entities after cap:   {(kept // 2) * GANGS}")
+        print(f"after deleting one:   {_entity_count(hass)}")
+        await hass.async_stop(force=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
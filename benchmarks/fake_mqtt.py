@@ -0,0 +1,285 @@
+"""In-process stand-in for ``homeassistant.components.mqtt``.
+
+``FakeBroker`` implements ``async_subscribe``/``async_publish`` with MQTT
+wildcard matching and retained messages, and ``async_start_integration``
+sets the integration up on a bare ``HomeAssistant`` against it, through
+its real ``async_setup_entry`` and platform setup. No broker, network or
+``mqtt`` config entry is needed.
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+from types import SimpleNamespace
+from typing import Callable
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant import loader
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers import restore_state
+from homeassistant.helpers.entity import DATA_ENTITY_SOURCE
+from homeassistant.helpers.entity_platform import EntityPlatform
+from homeassistant.components import mqtt
+
+from custom_components.lanbon_switch import climate, sensor, switch
+from custom_components.lanbon_switch import async_setup_entry, async_unload_entry
+from custom_components.lanbon_switch.const import DOMAIN
+from custom_components.lanbon_switch.discovery import ADD_ENTITIES_KEYS, LanbonDiscovery
+from custom_components.lanbon_switch.dispatcher import LanbonDispatcher
+from custom_components.lanbon_switch.eviction import LanbonEviction
+from custom_components.lanbon_switch.metrics import LanbonMetrics
+from custom_components.lanbon_switch.registry import LanbonRegistry
+from custom_components.lanbon_switch.storage import LanbonStorage
+
+_LOGGER = logging.getLogger(__name__)
+
+PLATFORMS = {"switch": switch, "climate": climate, "sensor": sensor}
+SCAN_INTERVAL = timedelta(seconds=30)
+
+
+def topic_matches(pattern: str, topic: str) -> bool:
+    pattern_parts = pattern.split("/")
+    topic_parts = topic.split("/")
+    for index, part in enumerate(pattern_parts):
+        if part == "#":
+            return True
+        if index >= len(topic_parts):
+            return False
+        if part != "+" and part != topic_parts[index]:
+            return False
+    return len(pattern_parts) == len(topic_parts)
+
+
+class FakeBroker:
+    """Deliver published messages to matching subscriptions on the loop.
+
+    Every delivery is timed; ``dispatch_times`` keeps the seconds spent in
+    the subscriber callback for each message, per subscription pattern.
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        self.hass = hass
+        self.retained: dict[str, object] = {}
+        self.published = 0
+        self.delivered = 0
+        self.dispatch_times: dict[str, list[float]] = defaultdict(list)
+        self._subscriptions: list[tuple[str, Callable, str | None]] = []
+        self._original = None
+
+    @property
+    def subscription_count(self) -> int:
+        return len(self._subscriptions)
+
+    def install(self):
+        """Swap the broker in for ``mqtt.async_subscribe``/``mqtt.async_publish``."""
+        self._original = (mqtt.async_subscribe, mqtt.async_publish)
+        mqtt.async_subscribe = self.async_subscribe
+        mqtt.async_publish = self.async_publish
+
+    def uninstall(self):
+        if self._original is not None:
+            mqtt.async_subscribe, mqtt.async_publish = self._original
+            self._original = None
+
+    async def async_subscribe(self, hass, topic, msg_callback, qos=0, encoding="utf-8"):
+        subscription = (topic, msg_callback, encoding)
+        self._subscriptions.append(subscription)
+        for retained_topic, payload in list(self.retained.items()):
+            if topic_matches(topic, retained_topic):
+                hass.loop.call_soon(
+                    self._deliver, subscription, retained_topic, payload, True
+                )
+
+        @callback
+        def unsubscribe():
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+        return unsubscribe
+
+    async def async_publish(self, hass, topic, payload, qos=0, retain=False, encoding="utf-8"):
+        self.async_inject(topic, payload, retain)
+
+    @callback
+    def async_inject(self, topic: str, payload, retain: bool = False):
+        """Publish from the device side; subscribers run on a later loop iteration."""
+        self.published += 1
+        if retain:
+            self.retained[topic] = payload
+        for subscription in self._subscriptions:
+            if topic_matches(subscription[0], topic):
+                self.hass.loop.call_soon(self._deliver, subscription, topic, payload, retain)
+
+    def _deliver(self, subscription, topic, payload, retain):
+        pattern, msg_callback, encoding = subscription
+        if subscription not in self._subscriptions:
+            return
+        if isinstance(payload, str) and encoding is None:
+            payload = payload.encode()
+        elif isinstance(payload, bytes) and encoding is not None:
+            payload = payload.decode(encoding)
+        msg = SimpleNamespace(
+            topic=topic,
+            payload=payload,
+            qos=0,
+            retain=retain,
+            subscribed_topic=pattern,
+            timestamp=time.monotonic(),
+        )
+        start = time.perf_counter()
+        msg_callback(msg)
+        self.dispatch_times[pattern].append(time.perf_counter() - start)
+        self.delivered += 1
+
+
+class FakeConfigEntry:
+    """The parts of ``ConfigEntry`` the integration uses."""
+
+    def __init__(self, options: dict | None = None):
+        self.entry_id = "lanbon_benchmark"
+        self.domain = DOMAIN
+        self.title = "LANBON"
+        self.data = {}
+        self.options = dict(options or {})
+        self.pref_disable_polling = False
+        self.pref_disable_new_entities = False
+        self.disabled_by = None
+        self._on_unload: list[Callable] = []
+
+    def async_on_unload(self, func: Callable):
+        self._on_unload.append(func)
+
+    def add_update_listener(self, listener) -> Callable:
+        return lambda: None
+
+    def async_run_unload(self):
+        while self._on_unload:
+            self._on_unload.pop()()
+
+
+class FakeConfigEntries:
+    """Forward platform setup straight to the integration's platform modules."""
+
+    def __init__(self, hass: HomeAssistant):
+        self.hass = hass
+        self.entries: list[FakeConfigEntry] = []
+        self.platforms: dict[str, EntityPlatform] = {}
+        # Platform -> seconds its setup waits first, like a component that
+        # Home Assistant still has to set up
+        self.setup_delays: dict[str, float] = {}
+
+    def async_entries(self, domain: str | None = None) -> list:
+        return list(self.entries)
+
+    def async_get_entry(self, entry_id: str):
+        return next((entry for entry in self.entries if entry.entry_id == entry_id), None)
+
+    async def async_forward_entry_setups(self, entry, platforms):
+        await asyncio.gather(*(self.async_forward_entry_setup(entry, domain) for domain in platforms))
+
+    async def async_forward_entry_setup(self, entry, domain):
+        if domain in self.setup_delays:
+            await asyncio.sleep(self.setup_delays[domain])
+        platform = EntityPlatform(
+            hass=self.hass,
+            logger=_LOGGER,
+            domain=domain,
+            platform_name=DOMAIN,
+            platform=PLATFORMS[domain],
+            scan_interval=SCAN_INTERVAL,
+            entity_namespace=None,
+        )
+        platform.config_entry = entry
+        self.platforms[domain] = platform
+        await PLATFORMS[domain].async_setup_entry(
+            self.hass, entry, platform._async_schedule_add_entities
+        )
+        while platform._tasks:
+            pending, platform._tasks = platform._tasks, []
+            await asyncio.gather(*pending)
+        platform._setup_complete = True
+        return True
+
+    async def async_forward_entry_unload(self, entry, domain):
+        platform = self.platforms.pop(domain, None)
+        if platform is not None:
+            # Also drops it from Home Assistant's list of entity platforms
+            await platform.async_destroy()
+        return True
+
+    async def async_reload(self, entry_id):
+        """Unload and set the entry up again, as ``ConfigEntries.async_reload`` does."""
+        entry = next(entry for entry in self.entries if entry.entry_id == entry_id)
+        await async_unload_entry(self.hass, entry)
+        entry.async_run_unload()
+        return await async_setup_entry(self.hass, entry)
+
+    def entities(self) -> list:
+        return [
+            entity
+            for platform in self.platforms.values()
+            for entity in platform.entities.values()
+        ]
+
+
+async def async_create_hass(config_dir: str) -> HomeAssistant:
+    """Return a bare ``HomeAssistant`` with the registries the entities need."""
+    hass = HomeAssistant(config_dir)
+    hass.config.set_time_zone("UTC")
+    loader.async_setup(hass)
+    hass.data[DATA_ENTITY_SOURCE] = {}
+    await asyncio.gather(
+        dr.async_load(hass),
+        er.async_load(hass),
+        restore_state.async_load(hass),
+    )
+    hass.config_entries = FakeConfigEntries(hass)
+    return hass
+
+
+async def async_start_integration(
+    hass: HomeAssistant, broker: FakeBroker, options: dict | None = None
+) -> FakeConfigEntry:
+    """Set the integration up against ``broker`` and fire ``homeassistant_started``."""
+    broker.install()
+    entry = FakeConfigEntry(options)
+    hass.config_entries.entries.append(entry)
+    await async_setup_entry(hass, entry)
+    hass.bus.async_fire("homeassistant_started")
+    return entry
+
+
+async def async_stop_integration(hass: HomeAssistant, broker: FakeBroker, entry: FakeConfigEntry):
+    await async_unload_entry(hass, entry)
+    entry.async_run_unload()
+    hass.config_entries.entries.remove(entry)
+    broker.uninstall()
+
+
+@callback
+def async_setup_discovery(
+    hass: HomeAssistant,
+    store: LanbonStorage,
+    add_entities: dict[str, Callable],
+    batch_delay: float,
+) -> tuple[LanbonDispatcher, LanbonDiscovery]:
+    """Run the dispatcher and discovery pipeline on a bare ``hass``, without an entry.
+
+    ``add_entities`` maps a device type to the ``async_add_entities`` its
+    platform would have stored. Messages go in through the returned
+    dispatcher's ``async_dispatch``.
+    """
+    hass.data[DOMAIN] = {
+        "registry": LanbonRegistry(),
+        "store": store,
+        "metrics": LanbonMetrics(hass),
+        "eviction": LanbonEviction(hass),
+        **{ADD_ENTITIES_KEYS[kind]: add for kind, add in add_entities.items()},
+    }
+    dispatcher = LanbonDispatcher(hass)
+    hass.data[DOMAIN]["dispatcher"] = dispatcher
+    discovery = LanbonDiscovery(hass, batch_delay=batch_delay)
+    discovery.async_setup(dispatcher)
+    return dispatcher, discovery
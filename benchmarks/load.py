@@ -0,0 +1,385 @@
+"""Offline load generator and benchmark suite for the integration.
+
+Runs the integration against the in-process broker from ``fake_mqtt``
+with a simulated fleet of switch panels (1 to 4 gangs, so a quarter of
+them need the gang-4 workaround) and thermostats that echo commands and
+re-publish their state at a steady rate. Measures:
+
+- discovery: time from the fleet's retained announcements until every
+  channel has an entity
+- dispatch: seconds spent in the subscription callback per message under
+  steady traffic
+- commands: round trip of a switch command, from the call until the panel
+  has echoed every publish it caused, for regular and gang-4 channels
+- memory: bytes allocated per entity during discovery, on a separate run
+  under ``tracemalloc``
+
+With ``--loss`` devices drop that fraction of the commands they receive,
+to exercise the acknowledgement retries.
+
+Results are printed, or written with ``--output``, as JSON so runs of
+different versions can be compared. Run from the repository root:
+
+    python benchmarks/load.py --panels 250 --thermostats 25 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_mqtt import (  # noqa: E402
+    FakeBroker,
+    async_create_hass,
+    async_start_integration,
+    async_stop_integration,
+)
+
+from custom_components.lanbon_switch.const import DOMAIN  # noqa: E402
+
+MANIFEST = Path(__file__).resolve().parent.parent / "custom_components" / DOMAIN / "manifest.json"
+
+
+class SimulatedSwitchPanel:
+    """A panel that applies ``set`` commands and echoes them on ``state``.
+
+    Like the L8-HS4, it doesn't report gang 4 after a command.
+    """
+
+    def __init__(self, broker: FakeBroker, device_id_raw: str, gangs: int, latency: float, loss: float):
+        self.broker = broker
+        self.device_id_raw = device_id_raw
+        self.latency = latency
+        self.loss = loss
+        self.states = {f"{device_id_raw}-0{gang}": "OFF" for gang in range(1, gangs + 1)}
+        self.pending = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def state_topic(self, channel_id_raw: str) -> str:
+        return f"homeassistant/{self.device_id_raw}/switch/{channel_id_raw}/state"
+
+    async def async_connect(self):
+        await self.broker.async_subscribe(
+            self.broker.hass,
+            f"homeassistant/{self.device_id_raw}/switch/+/set",
+            self._command_received,
+        )
+
+    def announce(self):
+        for channel_id_raw in self.states:
+            self.publish_state(channel_id_raw)
+
+    def publish_state(self, channel_id_raw: str):
+        self.broker.async_inject(
+            self.state_topic(channel_id_raw), self.states[channel_id_raw], retain=True
+        )
+
+    def _command_received(self, msg):
+        channel_id_raw = msg.topic.split("/")[3]
+        if channel_id_raw not in self.states or random.random() < self.loss:
+            return
+        self.states[channel_id_raw] = msg.payload
+        if channel_id_raw.endswith("-04"):
+            return
+        self.pending += 1
+        self._idle.clear()
+        self.broker.hass.loop.call_later(
+            self.latency * random.uniform(0.5, 1.5), self._echo, channel_id_raw
+        )
+
+    def _echo(self, channel_id_raw):
+        self.publish_state(channel_id_raw)
+        self.pending -= 1
+        if not self.pending:
+            self._idle.set()
+
+    async def async_wait_idle(self):
+        await self._idle.wait()
+
+
+class SimulatedThermostat:
+    """A thermostat that echoes mode/target changes and reports temperature."""
+
+    def __init__(
+        self, broker: FakeBroker, device_id_raw: str, channel_id_raw: str, latency: float, loss: float
+    ):
+        self.broker = broker
+        self.base = f"homeassistant/{device_id_raw}/thermostat/{channel_id_raw}/"
+        self.latency = latency
+        self.loss = loss
+        self.mode = "auto"
+        self.target = 21.0
+        self.current = random.uniform(18, 24)
+
+    async def async_connect(self):
+        for subtopic in ("modeSet", "temperatureSet"):
+            await self.broker.async_subscribe(
+                self.broker.hass, self.base + subtopic, self._command_received
+            )
+
+    def announce(self):
+        self.broker.async_inject(self.base + "modeState", self.mode, retain=True)
+        self.broker.async_inject(self.base + "temperatureState", str(self.target), retain=True)
+        self.report()
+
+    def report(self):
+        self.current = round(self.current + random.uniform(-0.2, 0.2), 1)
+        self.broker.async_inject(self.base + "temperatureDetect", str(self.current))
+
+    def _command_received(self, msg):
+        if random.random() < self.loss:
+            return
+        if msg.topic.endswith("modeSet"):
+            self.mode = msg.payload
+            reply = ("modeState", self.mode)
+        else:
+            self.target = float(msg.payload)
+            reply = ("temperatureState", str(self.target))
+        self.broker.hass.loop.call_later(
+            self.latency, self.broker.async_inject, self.base + reply[0], reply[1], True
+        )
+
+
+class Fleet:
+    def __init__(self, broker: FakeBroker, panels: int, thermostats: int, latency: float, loss: float = 0):
+        self.panels = [
+            SimulatedSwitchPanel(broker, f"LB{index:010X}", index % 4 + 1, latency, loss)
+            for index in range(panels)
+        ]
+        self.thermostats = [
+            SimulatedThermostat(broker, f"LT{index:010X}", f"T{index:010X}", latency, loss)
+            for index in range(thermostats)
+        ]
+
+    @property
+    def channels(self) -> int:
+        return sum(len(panel.states) for panel in self.panels) + len(self.thermostats)
+
+    async def async_connect(self):
+        for device in (*self.panels, *self.thermostats):
+            await device.async_connect()
+
+    def announce(self):
+        for device in (*self.panels, *self.thermostats):
+            device.announce()
+
+    async def async_generate(self, duration: float, switch_interval: float, thermostat_interval: float):
+        """Publish state at the given per-channel intervals, spread evenly over time."""
+        switch_channels = [
+            (panel, channel_id_raw) for panel in self.panels for channel_id_raw in panel.states
+        ]
+        tick = 0.01
+        switch_rate = len(switch_channels) / switch_interval
+        thermostat_rate = len(self.thermostats) / thermostat_interval
+        switch_due = thermostat_due = 0.0
+        switch_index = thermostat_index = 0
+        start = time.monotonic()
+        while time.monotonic() - start < duration:
+            switch_due += switch_rate * tick
+            thermostat_due += thermostat_rate * tick
+            while switch_due >= 1 and switch_channels:
+                panel, channel_id_raw = switch_channels[switch_index % len(switch_channels)]
+                panel.publish_state(channel_id_raw)
+                switch_index += 1
+                switch_due -= 1
+            while thermostat_due >= 1 and self.thermostats:
+                self.thermostats[thermostat_index % len(self.thermostats)].report()
+                thermostat_index += 1
+                thermostat_due -= 1
+            await asyncio.sleep(tick)
+
+
+def _percentiles(samples: list[float], scale: float) -> dict:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def at(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * scale, 3)
+
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered) * scale, 3),
+        "p50": at(0.50),
+        "p90": at(0.90),
+        "p99": at(0.99),
+        "max": round(ordered[-1] * scale, 3),
+    }
+
+
+def _bound_channels(hass) -> int:
+    registry = hass.data[DOMAIN]["registry"]
+    return sum(
+        1
+        for kind in ("switch", "thermostat")
+        for channel in registry.channels(kind)
+        if channel.entity is not None
+    )
+
+
+async def _async_discover(hass, fleet: Fleet, timeout: float) -> float:
+    start = time.perf_counter()
+    fleet.announce()
+    while _bound_channels(hass) < fleet.channels:
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError(f"{_bound_channels(hass)} of {fleet.channels} channels discovered")
+        await asyncio.sleep(0.01)
+    return time.perf_counter() - start
+
+
+async def _async_command_round_trips(hass, fleet: Fleet, samples: int) -> dict:
+    panels = {panel.device_id_raw: panel for panel in fleet.panels}
+    regular, gang4 = [], []
+    for channel in hass.data[DOMAIN]["registry"].channels("switch"):
+        (gang4 if channel.is_gang4 else regular).append(channel)
+
+    results = {}
+    for name, channels in (("regular", regular), ("gang4", gang4)):
+        times = {"on": [], "off": []}
+        for channel in random.sample(channels, min(samples, len(channels))):
+            entity = channel.entity
+            panel = panels[channel.device_id_raw]
+            # Switch each channel and back, so both directions are timed
+            for _ in range(2):
+                start = time.perf_counter()
+                if entity.is_on:
+                    await entity.async_turn_off()
+                    direction = "off"
+                else:
+                    await entity.async_turn_on()
+                    direction = "on"
+                await panel.async_wait_idle()
+                times[direction].append(time.perf_counter() - start)
+        results[name] = _percentiles(times["on"] + times["off"], 1000)
+        for direction, values in times.items():
+            results[f"{name}_{direction}"] = _percentiles(values, 1000)
+    return results
+
+
+async def async_run(args) -> dict:
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await async_create_hass(config_dir)
+        broker = FakeBroker(hass)
+        fleet = Fleet(broker, args.panels, args.thermostats, args.latency, args.loss)
+        await fleet.async_connect()
+        entry = await async_start_integration(hass, broker, {"ack_timeout": args.ack_timeout})
+
+        discovery_time = await _async_discover(hass, fleet, args.timeout)
+        await hass.async_block_till_done()
+
+        broker.dispatch_times.clear()
+        delivered = broker.delivered
+        start = time.perf_counter()
+        await fleet.async_generate(args.duration, args.switch_interval, args.thermostat_interval)
+        await hass.async_block_till_done()
+        elapsed = time.perf_counter() - start
+        dispatch_times = [
+            seconds for pattern, times in broker.dispatch_times.items()
+            if pattern.startswith("homeassistant/+/") for seconds in times
+        ]
+
+        commands = await _async_command_round_trips(hass, fleet, args.samples)
+        stats = dict(hass.data[DOMAIN]["stats"])
+        metrics = hass.data[DOMAIN]["metrics"].as_dict()
+        acks = hass.data[DOMAIN]["acks"]
+        acks = {key: value for key, value in acks.as_dict().items() if key != "latency"}
+        discovery = hass.data[DOMAIN]["discovery"]
+
+        await async_stop_integration(hass, broker, entry)
+        await hass.async_stop(force=True)
+
+    return {
+        "discovery": {
+            "seconds": round(discovery_time, 4),
+            "channels": fleet.channels,
+            "batches": discovery.batches,
+        },
+        "dispatch": {
+            "messages": len(dispatch_times),
+            "messages_per_second": round((broker.delivered - delivered) / elapsed, 1),
+            "latency_us": _percentiles(dispatch_times, 1e6),
+        },
+        "commands_ms": commands,
+        "stats": stats,
+        "acks": acks,
+        "metrics": metrics,
+    }
+
+
+async def async_measure_memory(args) -> dict:
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await async_create_hass(config_dir)
+        broker = FakeBroker(hass)
+        fleet = Fleet(broker, args.panels, args.thermostats, args.latency)
+        await fleet.async_connect()
+        entry = await async_start_integration(hass, broker)
+        await hass.async_block_till_done()
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        await _async_discover(hass, fleet, args.timeout * 10)
+        await hass.async_block_till_done()
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        await async_stop_integration(hass, broker, entry)
+        await hass.async_stop(force=True)
+
+    return {
+        "entities": fleet.channels,
+        "bytes_per_entity": round((after - before) / fleet.channels),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--panels", type=int, default=250)
+    parser.add_argument("--thermostats", type=int, default=25)
+    parser.add_argument("--duration", type=float, default=10, help="steady traffic seconds")
+    parser.add_argument("--switch-interval", type=float, default=30, help="seconds between state reports per gang")
+    parser.add_argument("--thermostat-interval", type=float, default=5, help="seconds between temperature reports")
+    parser.add_argument("--latency", type=float, default=0.005, help="simulated device echo latency")
+    parser.add_argument("--loss", type=float, default=0, help="fraction of commands devices drop")
+    parser.add_argument("--ack-timeout", type=float, default=2, help="seconds before a command is resent")
+    parser.add_argument("--samples", type=int, default=10, help="channels switched per channel type")
+    parser.add_argument("--timeout", type=float, default=30, help="discovery timeout")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    # Keep stdout and stderr clean for the JSON results
+    logging.basicConfig(level=logging.ERROR)
+    random.seed(args.seed)
+    results = {
+        "version": json.loads(MANIFEST.read_text())["version"],
+        "python": platform.python_version(),
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output", "no_memory")
+        },
+        **asyncio.run(async_run(args)),
+    }
+    if not args.no_memory:
+        random.seed(args.seed)
+        results["memory"] = asyncio.run(async_measure_memory(args))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
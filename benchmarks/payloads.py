@@ -0,0 +1,171 @@
+"""Compare parsing payloads from bytes with decoding them to str first.
+
+Replays a mixed stream of switch states, temperature readings and
+thermostat modes. The "str" path is what the handlers did with Home
+Assistant's default UTF-8 subscriptions: decode every payload, compare
+against lists, call ``float`` and tell thermostat subtopics apart by
+comparing topics. The "bytes" path is the current one: ``encoding=None``
+subscriptions, lookup tables, the cached float parser and one handler
+per subtopic. Both run behind the real dispatcher.
+
+Run from the repository root:
+
+    python benchmarks/payloads.py [messages]
+"""
+import random
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from custom_components.lanbon_switch.const import DOMAIN  # noqa: E402
+from custom_components.lanbon_switch.dispatcher import LanbonDispatcher  # noqa: E402
+from custom_components.lanbon_switch.panel import LanbonPanel  # noqa: E402
+from custom_components.lanbon_switch.payloads import (  # noqa: E402
+    SWITCH_STATES,
+    parse_float,
+    parse_mode,
+)
+from custom_components.lanbon_switch.registry import Panel  # noqa: E402
+
+PANELS = 500
+THERMOSTATS = 200
+ROUNDS = 5
+
+
+class State:
+    switch = None
+    target = None
+    current = None
+    mode = None
+
+
+def str_handlers(state: State, topics: dict):
+    def switch(msg):
+        payload = msg.payload.decode("utf-8")
+        if payload in ["ON", "OFF"]:
+            state.switch = payload
+
+    def thermostat(msg):
+        payload = msg.payload.decode("utf-8")
+        if msg.topic == topics["temperatureState"]:
+            try:
+                state.target = float(payload)
+            except ValueError:
+                pass
+        elif msg.topic == topics["temperatureDetect"]:
+            try:
+                state.current = float(payload)
+            except ValueError:
+                pass
+        elif msg.topic == topics["modeState"]:
+            state.mode = payload
+
+    return switch, {subtopic: thermostat for subtopic in topics}
+
+
+def bytes_handlers(state: State, topics: dict):
+    def switch(msg):
+        value = SWITCH_STATES.get(msg.payload)
+        if value is not None:
+            state.switch = value
+
+    def temperature_state(msg):
+        value = parse_float(msg.payload)
+        if value is not None:
+            state.target = value
+
+    def temperature_detect(msg):
+        value = parse_float(msg.payload)
+        if value is not None:
+            state.current = value
+
+    def mode_state(msg):
+        state.mode = parse_mode(msg.payload)
+
+    return switch, {
+        "temperatureState": temperature_state,
+        "temperatureDetect": temperature_detect,
+        "modeState": mode_state,
+    }
+
+
+def build(handlers) -> tuple[LanbonDispatcher, list, dict]:
+    dispatcher = LanbonDispatcher(hass=None)
+    hass = SimpleNamespace(data={DOMAIN: {"dispatcher": dispatcher}})
+    state = State()
+    messages = []
+    # Topic -> handler, to time the handlers without the dispatcher
+    by_topic = {}
+    rng = random.Random(1)
+    for index in range(PANELS):
+        device_id_raw = f"D{index:011X}"
+        panel = LanbonPanel(hass, Panel("switch", device_id_raw))
+        for gang in range(1, 4):
+            channel_id_raw = f"{device_id_raw}-0{gang}"
+            topics = {
+                subtopic: f"homeassistant/{device_id_raw}/thermostat/{channel_id_raw}/{subtopic}"
+                for subtopic in ("temperatureState", "temperatureDetect", "modeState")
+            }
+            switch, _ = handlers(state, topics)
+            panel.async_register(channel_id_raw, "state", switch)
+            topic = f"homeassistant/{device_id_raw}/switch/{channel_id_raw}/state"
+            by_topic[topic] = switch
+            for payload in (b"ON", b"OFF"):
+                messages.append(SimpleNamespace(topic=topic, payload=payload))
+    for index in range(THERMOSTATS):
+        device_id_raw = f"T{index:011X}"
+        channel_id_raw = f"{device_id_raw}-01"
+        panel = LanbonPanel(hass, Panel("thermostat", device_id_raw))
+        topics = {
+            subtopic: f"homeassistant/{device_id_raw}/thermostat/{channel_id_raw}/{subtopic}"
+            for subtopic in ("temperatureState", "temperatureDetect", "modeState")
+        }
+        _, thermostat = handlers(state, topics)
+        for subtopic, handler in thermostat.items():
+            panel.async_register(channel_id_raw, subtopic, handler)
+            by_topic[topics[subtopic]] = handler
+        for _ in range(4):
+            reading = f"{rng.uniform(15, 30):.1f}".encode()
+            messages.append(SimpleNamespace(topic=topics["temperatureDetect"], payload=reading))
+        messages.append(SimpleNamespace(topic=topics["temperatureState"], payload=b"21.5"))
+        messages.append(SimpleNamespace(topic=topics["modeState"], payload=b"auto"))
+    return dispatcher, messages, by_topic
+
+
+def bench(handlers, stream_length: int) -> tuple[float, float]:
+    """Return the best per-message time through the dispatcher and of the handler alone."""
+    dispatcher, messages, by_topic = build(handlers)
+    stream = [messages[index % len(messages)] for index in range(stream_length)]
+    random.Random(2).shuffle(stream)
+    calls = [(by_topic[msg.topic], msg) for msg in stream]
+
+    dispatch = handle = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for msg in stream:
+            dispatcher.async_dispatch(msg)
+        dispatch = min(dispatch, time.perf_counter() - start)
+        start = time.perf_counter()
+        for handler, msg in calls:
+            handler(msg)
+        handle = min(handle, time.perf_counter() - start)
+    return dispatch / stream_length, handle / stream_length
+
+
+def main(stream_length: int):
+    before = bench(str_handlers, stream_length)
+    after = bench(bytes_handlers, stream_length)
+    print(f"messages:      {stream_length}")
+    for label, index in (("dispatch", 0), ("handler", 1)):
+        print(
+            f"{label + ':':10} str {before[index] * 1e9:5.0f} ns  bytes {after[index] * 1e9:5.0f} ns"
+            f"  saved {(before[index] - after[index]) * 1e9:4.0f} ns/message"
+            f" ({(1 - after[index] / before[index]) * 100:.0f}%)"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,69 @@
+"""Count registry writes during a simulated discovery burst.
+
+Feeds a burst of new devices through the dispatcher and discovery
+pipeline, spread over many loop iterations, and asserts that the whole
+burst is written to storage exactly once.
+
+Run from the repository root:
+
+    python benchmarks/persistence.py [devices]
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_mqtt import async_setup_discovery  # noqa: E402
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from custom_components.lanbon_switch.const import DOMAIN  # noqa: E402
+from custom_components.lanbon_switch.storage import LanbonStorage  # noqa: E402
+
+SAVE_DELAY = 2
+BATCH_DELAY = 0.05
+
+
+async def main(devices: int):
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        store = LanbonStorage(hass, SAVE_DELAY)
+        dispatcher, _ = async_setup_discovery(
+            hass, store, {"switch": lambda entities, update_before_add=False: None}, BATCH_DELAY
+        )
+        registry = hass.data[DOMAIN]["registry"]
+
+        start = time.perf_counter()
+        for index in range(devices):
+            device_id_raw = f"D{index:011X}"
+            dispatcher.async_dispatch(
+                SimpleNamespace(
+                    topic=f"homeassistant/{device_id_raw}/switch/{device_id_raw}-01/state",
+                    payload=b"ON",
+                )
+            )
+            # Let other callbacks interleave, as they would on the loop
+            await asyncio.sleep(0)
+        await asyncio.sleep(BATCH_DELAY * 2)
+        await hass.async_block_till_done()
+        burst = time.perf_counter() - start
+        assert len(registry) == devices, (len(registry), devices)
+        assert burst < SAVE_DELAY, f"burst took {burst:.3f} s, longer than the save delay"
+
+        await asyncio.sleep(SAVE_DELAY)
+        await hass.async_block_till_done()
+        await store.async_flush()
+        assert store.write_count == 1, store.write_count
+
+        print(f"devices discovered: {devices}")
+        print(f"burst duration:     {burst:.3f} s")
+        print(f"registry writes:    {store.write_count}")
+        await hass.async_stop(force=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5_000))
@@ -0,0 +1,101 @@
+"""Compare memory of the nested-dict device layout with the slotted registry.
+
+Run from the repository root:
+
+    python benchmarks/registry_memory.py [channels]
+"""
+import gc
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from custom_components.lanbon_switch.registry import LanbonRegistry  # noqa: E402
+
+GANGS = 4
+THERMOSTAT_EVERY = 10
+
+
+def channel_ids(channels: int):
+    """Yield (kind, device_id_raw, channel_id_raw) for a mixed fleet."""
+    for index in range(channels):
+        panel = index // GANGS
+        device_id_raw = f"D{panel:011X}"
+        if panel % THERMOSTAT_EVERY == THERMOSTAT_EVERY - 1:
+            if index % GANGS == 0:
+                yield "thermostat", device_id_raw, f"T{panel:011X}"
+            continue
+        yield "switch", device_id_raw, f"{device_id_raw}-0{index % GANGS + 1}"
+
+
+def build_nested(ids):
+    """The previous known_devices layout plus the topic strings each entity rebuilt."""
+    known_devices = {"switch": {}, "thermostat": {}}
+    entities = {}
+    entity_topics = []
+    for kind, device_id_raw, channel_id_raw in ids:
+        device_id = device_id_raw.lower()
+        channel_id = channel_id_raw.lower()
+        base = f"homeassistant/{device_id_raw}/{kind}/{channel_id_raw}/"
+        if kind == "switch":
+            info = {
+                "device_id_raw": device_id_raw,
+                "switch_id_raw": channel_id_raw,
+                "set_topic": base + "set",
+            }
+            strings = [base + "state"]
+            if channel_id.endswith("-04"):
+                gang1_id_raw = channel_id_raw.replace("-04", "-01")
+                gang1_id = channel_id.replace("-04", "-01")
+                strings += [
+                    gang1_id_raw,
+                    gang1_id,
+                    f"homeassistant/{device_id_raw}/switch/{gang1_id_raw}/set",
+                    f"switch.lanbon_switch_{device_id}_switch_{gang1_id.replace('-', '_')}",
+                ]
+            entity_topics.append(strings)
+        else:
+            info = {
+                "device_id_raw": device_id_raw,
+                "thermostat_id_raw": channel_id_raw,
+                "temperature_state_topic": base + "temperatureState",
+                "temperature_detect_topic": base + "temperatureDetect",
+                "mode_state_topic": base + "modeState",
+                "temperature_set_topic": base + "temperatureSet",
+                "mode_set_topic": base + "modeSet",
+            }
+        known_devices[kind].setdefault(device_id, {})[channel_id] = info
+        entities[f"{device_id}_{channel_id}"] = True
+    return known_devices, entities, entity_topics
+
+
+def build_registry(ids):
+    registry = LanbonRegistry()
+    for kind, device_id_raw, channel_id_raw in ids:
+        registry.add(kind, device_id_raw, channel_id_raw)
+    return registry
+
+
+def measure(builder, ids) -> int:
+    gc.collect()
+    tracemalloc.start()
+    result = builder(ids)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main(channels: int):
+    ids = list(channel_ids(channels))
+    nested = measure(build_nested, ids)
+    registry = measure(build_registry, ids)
+    print(f"channels:        {len(ids)}")
+    print(f"nested dicts:    {nested / 1024:10.1f} KiB  ({nested / len(ids):6.0f} B/channel)")
+    print(f"slotted registry:{registry / 1024:10.1f} KiB  ({registry / len(ids):6.0f} B/channel)")
+    print("The registry figure includes its topic index, which the nested layout lacks.")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,127 @@
+"""Reload the integration many times and check that nothing accumulates.
+
+Discovers a fleet from retained messages, then reloads the config entry
+over and over. After every reload the MQTT subscriptions, dispatcher
+listeners, bus listeners, scheduled timers, running tasks and entities
+are counted; none of them may grow between the first reloads and the
+last, the registry must be the one loaded at startup, and traced memory
+must not grow beyond a small allowance.
+
+Run from the repository root:
+
+    python benchmarks/reload.py [cycles] [panels]
+"""
+import asyncio
+import gc
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_mqtt import (  # noqa: E402
+    FakeBroker,
+    async_create_hass,
+    async_start_integration,
+    async_stop_integration,
+)
+from homeassistant.core import CoreState  # noqa: E402
+
+from custom_components.lanbon_switch.const import DOMAIN  # noqa: E402
+
+GANGS = 3
+WARMUP = 5
+# Traced memory may grow by this much over all cycles, for interning and caches
+MEMORY_ALLOWANCE = 256 * 1024
+
+
+def _counts(hass, broker) -> dict:
+    data = hass.data[DOMAIN]
+    return {
+        "subscriptions": broker.subscription_count,
+        "dispatcher_listeners": len(data["dispatcher"]._listeners),
+        "dispatcher_routes": data["dispatcher"].route_count,
+        "bus_listeners": sum(hass.bus.async_listeners().values()),
+        "timers": sum(not handle.cancelled() for handle in hass.loop._scheduled),
+        "tasks": len(asyncio.all_tasks()),
+        "entities": len(hass.config_entries.entities()),
+    }
+
+
+async def _async_settle(hass, broker):
+    await hass.async_block_till_done()
+    # Let the state sync see the retained messages and finish
+    while hass.data[DOMAIN]["sync"].running:
+        await asyncio.sleep(0)
+    await hass.async_block_till_done()
+    broker.dispatch_times.clear()
+
+
+async def main(cycles: int, panels: int):
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await async_create_hass(config_dir)
+        broker = FakeBroker(hass)
+        for index in range(panels):
+            device_id_raw = f"D{index:011X}"
+            for gang in range(1, GANGS + 1):
+                broker.async_inject(
+                    f"homeassistant/{device_id_raw}/switch/{device_id_raw}-0{gang}/state",
+                    "ON" if gang % 2 else "OFF",
+                    retain=True,
+                )
+
+        options = {"save_delay": 0}
+        entry = await async_start_integration(hass, broker, options)
+        while hass.data[DOMAIN]["discovery"].batches == 0:
+            await asyncio.sleep(0.05)
+        await _async_settle(hass, broker)
+        # Reloads happen while Home Assistant is running
+        hass.state = CoreState.running
+        registry = hass.data[DOMAIN]["registry"]
+
+        tracemalloc.start()
+        reload_times = []
+        baseline = memory_baseline = None
+        for cycle in range(1, cycles + 1):
+            start = time.perf_counter()
+            await hass.config_entries.async_reload(entry.entry_id)
+            reload_times.append(time.perf_counter() - start)
+            await _async_settle(hass, broker)
+            assert hass.data[DOMAIN]["registry"] is registry
+            if cycle == WARMUP:
+                gc.collect()
+                baseline = _counts(hass, broker)
+                memory_baseline = tracemalloc.get_traced_memory()[0]
+
+        gc.collect()
+        final = _counts(hass, broker)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        # Home Assistant's own delayed saves may have fired in the meantime
+        assert all(final[name] <= baseline[name] for name in final), (baseline, final)
+        assert final["entities"] == panels * GANGS, final
+        assert memory - memory_baseline < MEMORY_ALLOWANCE, memory - memory_baseline
+
+        ordered = sorted(reload_times)
+        print(f"cycles:               {cycles}")
+        for name, value in final.items():
+            print(f"{name + ':':22}{value} (after cycle {WARMUP}: {baseline[name]})")
+        print(f"memory growth:        {(memory - memory_baseline) / 1024:.1f} KiB over {cycles - WARMUP} reloads")
+        print(f"reload p50:           {ordered[len(ordered) // 2] * 1000:.1f} ms")
+        print(f"reload max:           {ordered[-1] * 1000:.1f} ms")
+
+        await async_stop_integration(hass, broker, entry)
+        await hass.async_stop(force=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 100,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 100,
+        )
+    )
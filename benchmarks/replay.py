@@ -0,0 +1,165 @@
+"""Replay a recorded capture through the integration.
+
+Sets the integration up against the fake broker and injects every record
+of a ``lanbon_switch.capture`` file, rotated files included, so the
+traffic goes through the same dispatcher, ``discover_*`` handlers and
+entity callbacks as in production. Records are replayed at their
+original pace, ``--speed`` times faster, or with ``--max`` as fast as the
+loop takes them. Reports throughput, how far injection fell behind the
+schedule, per-message dispatch latency and the integration's handler
+metrics; ``--profile`` writes a cProfile file of the replay.
+
+Run from the repository root:
+
+    python benchmarks/replay.py CAPTURE [--speed N | --max] [--profile FILE]
+"""
+import argparse
+import asyncio
+import cProfile
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_mqtt import (  # noqa: E402
+    FakeBroker,
+    async_create_hass,
+    async_start_integration,
+    async_stop_integration,
+)
+
+from custom_components.lanbon_switch.capture import capture_files, read_capture  # noqa: E402
+from custom_components.lanbon_switch.const import DISCOVERY_BATCH_DELAY, DOMAIN  # noqa: E402
+
+# Records injected between yields to the loop with --max
+MAX_SPEED_CHUNK = 500
+
+
+def _percentiles(samples: list[float], scale: float) -> dict:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def at(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * scale, 3)
+
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered) * scale, 3),
+        "p50": at(0.50),
+        "p90": at(0.90),
+        "p99": at(0.99),
+        "max": round(ordered[-1] * scale, 3),
+    }
+
+
+def records(path: str):
+    for file in capture_files(path):
+        yield from read_capture(file)
+
+
+async def _async_replay(hass, broker, path: str, speed: float | None) -> dict:
+    """Inject the capture and return the record count, capture span and lag."""
+    loop = hass.loop
+    count = 0
+    first = last = None
+    lags = []
+    start = loop.time()
+    for timestamp, topic, payload, retain in records(path):
+        if first is None:
+            first = timestamp
+        last = timestamp
+        if speed is None:
+            if count % MAX_SPEED_CHUNK == 0:
+                await asyncio.sleep(0)
+        else:
+            due = start + (timestamp - first) / speed
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lags.append(loop.time() - due)
+        broker.async_inject(topic, payload, retain)
+        count += 1
+    return {
+        "records": count,
+        "span": 0 if first is None else last - first,
+        "lag_ms": _percentiles(lags, 1000),
+    }
+
+
+async def async_run(args) -> dict:
+    speed = None if args.max else args.speed
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await async_create_hass(config_dir)
+        broker = FakeBroker(hass)
+        entry = await async_start_integration(hass, broker, json.loads(args.options))
+
+        profile = cProfile.Profile() if args.profile else None
+        start = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        replay = await _async_replay(hass, broker, args.capture, speed)
+        await hass.async_block_till_done()
+        elapsed = time.perf_counter() - start
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(args.profile)
+
+        # Let the last discovery batch turn into entities
+        await asyncio.sleep(DISCOVERY_BATCH_DELAY)
+        await hass.async_block_till_done()
+        dispatch_times = [
+            seconds for times in broker.dispatch_times.values() for seconds in times
+        ]
+        data = hass.data[DOMAIN]
+        result = {
+            "capture": args.capture,
+            "speed": "max" if speed is None else speed,
+            "records": replay["records"],
+            "capture_seconds": round(replay["span"], 3),
+            "replay_seconds": round(elapsed, 3),
+            "messages_per_second": round(replay["records"] / elapsed, 1) if elapsed else None,
+            "lag_ms": replay["lag_ms"],
+            "dispatch_us": _percentiles(dispatch_times, 1e6),
+            "panels": data["registry"].panel_count,
+            "entities": len(hass.config_entries.entities()),
+            "stats": dict(data["stats"]),
+            "metrics": {
+                name: {key: value for key, value in metrics.items() if key != "histogram"}
+                for name, metrics in data["metrics"].as_dict().items()
+                if metrics["calls"]
+            },
+        }
+
+        await async_stop_integration(hass, broker, entry)
+        await hass.async_stop(force=True)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("capture", help="capture file; its rotated files are replayed first")
+    pace = parser.add_mutually_exclusive_group()
+    pace.add_argument("--speed", type=float, default=1, help="replay N times faster than recorded")
+    pace.add_argument("--max", action="store_true", help="replay as fast as possible")
+    parser.add_argument("--options", default="{}", help="config entry options as JSON")
+    parser.add_argument("--profile", help="write a cProfile file of the replay here")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+
+    result = asyncio.run(async_run(args))
+    text = json.dumps(result, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
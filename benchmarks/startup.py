@@ -0,0 +1,150 @@
+"""Time config entry setup from a large stored fleet.
+
+Runs ``async_setup_entry`` end to end against the fake broker, real entity
+platforms included, for a switch-only fleet and for a mixed one. On the
+switch-only fleet it then times the first thermostat discovered, which has
+to load the climate platform first, and checks that a second thermostat
+discovered while that platform is still setting up gets a single entity.
+
+Run from the repository root:
+
+    python benchmarks/startup.py [panels]
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from cold_start import build_registry  # noqa: E402
+from fake_mqtt import (  # noqa: E402
+    FakeBroker,
+    async_create_hass,
+    async_start_integration,
+    async_stop_integration,
+)
+
+from custom_components.lanbon_switch.const import DISCOVERY_BATCH_DELAY, DOMAIN  # noqa: E402
+from custom_components.lanbon_switch.storage import STORAGE_KEY, STORAGE_VERSION  # noqa: E402
+
+ROUNDS = 3
+# Probing thousands of silent devices isn't part of setup
+OPTIONS = {"sync_timeout": 3600}
+# Stands in for Home Assistant setting up the climate component first
+CLIMATE_SETUP_DELAY = 0.05
+
+
+def write_registry(config_dir: str, devices: dict):
+    os.makedirs(os.path.join(config_dir, ".storage"))
+    with open(os.path.join(config_dir, ".storage", STORAGE_KEY), "w") as file:
+        json.dump(
+            {
+                "version": STORAGE_VERSION,
+                "minor_version": 1,
+                "key": STORAGE_KEY,
+                "data": {"devices": devices},
+            },
+            file,
+        )
+
+
+async def _async_first_thermostat(hass, broker) -> float:
+    """Return the seconds until a newly discovered thermostat has its entity."""
+    registry = hass.data[DOMAIN]["registry"]
+    topic = "homeassistant/TNEW/thermostat/TNEW-01/modeState"
+    start = time.perf_counter()
+    broker.async_inject(topic, "auto")
+    while True:
+        channel = registry.by_topic(topic)
+        if channel is not None and channel.entity is not None:
+            return time.perf_counter() - start
+        await asyncio.sleep(0.001)
+
+
+async def check_thermostat_while_loading(devices: dict):
+    """Discover a second thermostat while the first one's platform sets up.
+
+    The climate platform creates both from the registry; discovery must not
+    add the second one again when its batch is flushed.
+    """
+    with tempfile.TemporaryDirectory() as config_dir:
+        write_registry(config_dir, devices)
+        hass = await async_create_hass(config_dir)
+        broker = FakeBroker(hass)
+        entry = await async_start_integration(hass, broker, OPTIONS)
+        hass.config_entries.setup_delays["climate"] = CLIMATE_SETUP_DELAY
+        errors = []
+        handler = logging.Handler(logging.ERROR)
+        handler.emit = errors.append
+        logging.getLogger("fake_mqtt").addHandler(handler)
+
+        broker.async_inject("homeassistant/T1/thermostat/T1-01/modeState", "auto")
+        # Just after the first batch started loading the platform
+        await asyncio.sleep(DISCOVERY_BATCH_DELAY + CLIMATE_SETUP_DELAY / 2)
+        broker.async_inject("homeassistant/T2/thermostat/T2-01/modeState", "auto")
+        await asyncio.sleep(DISCOVERY_BATCH_DELAY * 2)
+        await hass.async_block_till_done()
+
+        logging.getLogger("fake_mqtt").removeHandler(handler)
+        climate = hass.config_entries.platforms["climate"].entities
+        assert len(climate) == 2, list(climate)
+        assert not errors, [record.getMessage() for record in errors]
+        await async_stop_integration(hass, broker, entry)
+        await hass.async_stop(force=True)
+
+
+async def run(devices: dict, first_thermostat: bool) -> dict:
+    with tempfile.TemporaryDirectory() as config_dir:
+        write_registry(config_dir, devices)
+        hass = await async_create_hass(config_dir)
+        broker = FakeBroker(hass)
+
+        start = time.perf_counter()
+        entry = await async_start_integration(hass, broker, OPTIONS)
+        setup = time.perf_counter() - start
+        result = {
+            "setup": setup,
+            "platforms": sorted(hass.config_entries.platforms),
+            "entities": len(hass.config_entries.entities()),
+        }
+        if first_thermostat:
+            result["first_thermostat"] = await _async_first_thermostat(hass, broker)
+
+        await async_stop_integration(hass, broker, entry)
+        await hass.async_stop(force=True)
+    return result
+
+
+async def main(panels: int):
+    mixed = build_registry(panels)
+    switches = build_registry(panels)
+    switches["thermostat"].clear()
+
+    print(f"panels: {panels}")
+    for name, devices in (("switch-only", switches), ("mixed", mixed)):
+        results = [await run(devices, name == "switch-only") for _ in range(ROUNDS)]
+        best = min(results, key=lambda result: result["setup"])
+        print(f"{name}:")
+        print(f"  platforms:        {', '.join(best['platforms'])}")
+        print(f"  entities:         {best['entities']}")
+        print(f"  setup best:       {best['setup'] * 1000:.1f} ms")
+        print(
+            f"  setup mean:       "
+            f"{sum(result['setup'] for result in results) / ROUNDS * 1000:.1f} ms"
+        )
+        if "first_thermostat" in best:
+            print(
+                f"  first thermostat: "
+                f"{min(result['first_thermostat'] for result in results) * 1000:.1f} ms"
+            )
+    await check_thermostat_while_loading(switches)
+    print("thermostat discovered while its platform loads: one entity")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_500))
@@ -0,0 +1,81 @@
+"""Count thermostat state writes with and without the temperature period.
+
+Simulated thermostats report ``temperatureDetect`` at a fixed interval,
+with the default options and with ``temperature_period`` set. Every state
+write for a climate entity is a row the recorder would store.
+
+Run from the repository root:
+
+    python benchmarks/thermostat_telemetry.py [thermostats]
+"""
+import asyncio
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_mqtt import (  # noqa: E402
+    FakeBroker,
+    async_create_hass,
+    async_start_integration,
+    async_stop_integration,
+)
+from load import Fleet  # noqa: E402
+
+from homeassistant.const import EVENT_STATE_CHANGED  # noqa: E402
+
+DURATION = 10
+# Seconds between readings per thermostat
+REPORT_INTERVAL = 0.5
+PERIOD = 5
+
+
+async def run(thermostats: int, options: dict) -> tuple[int, int, dict]:
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await async_create_hass(config_dir)
+        broker = FakeBroker(hass)
+        fleet = Fleet(broker, 0, thermostats, latency=0.005)
+        await fleet.async_connect()
+        entry = await async_start_integration(hass, broker, options)
+        fleet.announce()
+        await asyncio.sleep(1)
+        await hass.async_block_till_done()
+
+        writes = 0
+        attributes = {}
+
+        def state_changed(event):
+            nonlocal writes, attributes
+            if event.data["entity_id"].startswith("climate."):
+                writes += 1
+                attributes = dict(event.data["new_state"].attributes)
+
+        remove = hass.bus.async_listen(EVENT_STATE_CHANGED, state_changed)
+        delivered = broker.delivered
+        await fleet.async_generate(DURATION, 3600, REPORT_INTERVAL)
+        await hass.async_block_till_done()
+        readings = broker.delivered - delivered
+        remove()
+
+        await async_stop_integration(hass, broker, entry)
+        await hass.async_stop(force=True)
+    return readings, writes, attributes
+
+
+async def main(thermostats: int):
+    print(f"thermostats: {thermostats}, one reading every {REPORT_INTERVAL} s for {DURATION} s")
+    for label, options in (
+        ("every reading", {}),
+        (f"period {PERIOD} s", {"temperature_period": PERIOD}),
+    ):
+        readings, writes, attributes = await run(thermostats, options)
+        print(f"{label + ':':16} {readings} readings, {writes} state writes")
+    statistics = {key: value for key, value in attributes.items() if key.startswith("temperature_")}
+    print(f"last attributes: {statistics}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
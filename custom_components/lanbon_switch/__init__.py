@@ -1,31 +1,58 @@
-import asyncio
 import logging
+from collections import Counter
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.components import mqtt
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.start import async_at_started
 from homeassistant.helpers.typing import ConfigType
-from homeassistant.helpers.storage import Store
 
 from .const import (
     DOMAIN,
-    TOPIC_PREFIX,
-    SWITCH_SUBTOPIC,
-    STATE_SUBTOPIC,
-    SET_SUBTOPIC,
-    THERMOSTAT_SUBTOPIC,
-    MODE_STATE_SUBTOPIC,
+    CONF_SAVE_DELAY,
+    DEFAULT_SAVE_DELAY,
+    CONF_SYNC_TIMEOUT,
+    DEFAULT_SYNC_TIMEOUT,
+    CONF_SYNC_RATE,
+    DEFAULT_SYNC_RATE,
+    CONF_SYNC_CONCURRENCY,
+    DEFAULT_SYNC_CONCURRENCY,
+    CONF_ACK_TIMEOUT,
+    DEFAULT_ACK_TIMEOUT,
+    CONF_ACK_RETRIES,
+    DEFAULT_ACK_RETRIES,
+    CONF_AVAILABILITY_TIMEOUT,
+    DEFAULT_AVAILABILITY_TIMEOUT,
+    CONF_DEVICE_TTL,
+    DEFAULT_DEVICE_TTL,
+    CONF_MAX_DEVICES,
+    DEFAULT_MAX_DEVICES,
+    CONF_TOPIC_PREFIXES,
+    DEFAULT_TOPIC_PREFIXES,
 )
+from .acks import LanbonAckTracker
+from .availability import LanbonAvailability
+from .capture import LanbonCapture
+from .commands import LanbonCommandScheduler
+from .discovery import LanbonDiscovery
+from .dispatcher import LanbonDispatcher
+from .eviction import LanbonEviction
+from .metrics import LanbonMetrics
+from .services import async_setup_services, async_unload_services
+from .registry import CHANNEL_TYPES, DEVICE_TYPES, LanbonRegistry
+from .storage import LanbonStorage
+from .sync import LanbonStateSync
 
 _LOGGER = logging.getLogger(__name__)
 
-STORAGE_VERSION = 1
-STORAGE_KEY = f"{DOMAIN}_devices"
+PLATFORMS = ["switch", "climate", "sensor"]
+# Set up even without devices; the others follow the device types present
+ALWAYS_PLATFORMS = ["sensor"]
 
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Set up the integration from YAML."""
     hass.data.setdefault(
         DOMAIN,
-        {"entities": {}, "set_topics": set(), "known_devices": {}},
+        {"registry": LanbonRegistry(), "stats": Counter()},
     )
     return True
 
@@ -33,195 +60,140 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up the integration from a ConfigEntry (UI-based setup)."""
     hass.data.setdefault(
         DOMAIN,
-        {"entities": {}, "set_topics": set(), "known_devices": {}},
+        {"registry": LanbonRegistry(), "stats": Counter()},
     )
 
-    store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
-
-    # Load known devices from storage
-    stored_data = await store.async_load()
-    if stored_data:
-        hass.data[DOMAIN]["known_devices"] = stored_data.get("devices", {})
-        hass.data[DOMAIN]["set_topics"] = set(stored_data.get("set_topics", []))
-    else:
-        hass.data[DOMAIN]["known_devices"] = {}
-        hass.data[DOMAIN]["set_topics"] = set()
-
-    # Clean up invalid device_key entries
-    for device_key in list(hass.data[DOMAIN]["known_devices"].keys()):
-        if not (isinstance(device_key, tuple) and len(device_key) == 2):
-            _LOGGER.warning("Removing invalid device_key: %s", device_key)
-            del hass.data[DOMAIN]["known_devices"][device_key]
-
-    # Save the cleaned-up data
-    await store.async_save(
-        {
-            "devices": hass.data[DOMAIN]["known_devices"],
-            "set_topics": list(hass.data[DOMAIN]["set_topics"]),
-        }
-    )
-
-    # Re-register entities from known devices
-    for device_key, device_info in hass.data[DOMAIN]["known_devices"].items():
-        if isinstance(device_key, tuple) and len(device_key) == 2:
-            device_type, device_id = device_key
-            if device_type == "switch":
-                for switch_id in device_info:
-                    entity_id = f"{device_id}_{switch_id}"
-                    if entity_id not in hass.data[DOMAIN]["entities"]:
-                        hass.data[DOMAIN]["entities"][entity_id] = True
-            elif device_type == "thermostat":
-                entity_id = device_id
-                if entity_id not in hass.data[DOMAIN]["entities"]:
-                    hass.data[DOMAIN]["entities"][entity_id] = True
-        else:
-            _LOGGER.warning("Skipping invalid device_key: %s", device_key)
-
-    # Forward setup to switch and climate platforms
-    _LOGGER.debug("Forwarding entry setup for switches and climate")
-    await hass.config_entries.async_forward_entry_setups(entry, ["switch", "climate"])
-
-    async def discover_switch(msg):
-        topic = msg.topic
-        payload = msg.payload
-        _LOGGER.debug("Received switch discovery message on topic: %s, payload: %s", topic, payload)
-
-        parts = topic.split('/')
-        if len(parts) != 5:
-            _LOGGER.error("Invalid switch topic structure: %s", topic)
-            return
-
-        _, device_id_raw, switch_subtopic, switch_id_raw, state_subtopic = parts
-        if switch_subtopic != SWITCH_SUBTOPIC or state_subtopic != STATE_SUBTOPIC:
-            _LOGGER.debug("Topic does not match expected switch subtopics")
-            return
-
-        device_id = device_id_raw.lower()
-        switch_id = switch_id_raw.lower()
-        entity_id = f"{device_id}_{switch_id}"
-
-        if entity_id in hass.data[DOMAIN]["entities"]:
-            return
-
-        set_topic = f"{TOPIC_PREFIX}{device_id_raw}/{SWITCH_SUBTOPIC}/{switch_id_raw}/{SET_SUBTOPIC}"
-        hass.data[DOMAIN]["set_topics"].add(set_topic)
-
-        device_key = ("switch", device_id)
-        device_entry = hass.data[DOMAIN]["known_devices"].setdefault(device_key, {})
-        device_entry[switch_id] = {
-            "device_id_raw": device_id_raw,
-            "switch_id_raw": switch_id_raw,
-            "set_topic": set_topic,
-        }
+    store = LanbonStorage(hass, entry.options.get(CONF_SAVE_DELAY, DEFAULT_SAVE_DELAY))
+    hass.data[DOMAIN]["store"] = store
 
-        await store.async_save(
-            {
-                "devices": hass.data[DOMAIN]["known_devices"],
-                "set_topics": list(hass.data[DOMAIN]["set_topics"]),
-            }
-        )
-
-        hass.data[DOMAIN]["entities"][entity_id] = True
-
-        if "add_switch_entities" in hass.data[DOMAIN]:
-            from .switch import LANBONSwitch
-            new_entity = LANBONSwitch(
-                hass,
-                device_id,
-                switch_id,
-                device_id_raw,
-                switch_id_raw,
-                f"{TOPIC_PREFIX}{device_id_raw}/{SWITCH_SUBTOPIC}/{switch_id_raw}/{STATE_SUBTOPIC}",
-                set_topic,
-            )
-            hass.data[DOMAIN]["add_switch_entities"]([new_entity], update_before_add=True)
-
-    async def discover_thermostat(msg):
-        topic = msg.topic
-        payload = msg.payload
-        _LOGGER.debug("Received thermostat discovery message on topic: %s, payload: %s", topic, payload)
-
-        parts = topic.split('/')
-        if len(parts) != 5:
-            _LOGGER.error("Invalid thermostat topic structure: %s", topic)
-            return
-
-        _, device_id_raw, thermostat_subtopic, thermostat_id_raw, mode_state_subtopic = parts
-        if thermostat_subtopic != THERMOSTAT_SUBTOPIC or mode_state_subtopic != MODE_STATE_SUBTOPIC:
-            _LOGGER.debug("Topic does not match expected thermostat subtopics")
-            return
-
-        device_id = device_id_raw.lower()
-        thermostat_id = thermostat_id_raw.lower()
-        entity_id = f"{device_id}_{thermostat_id}"
-
-        if entity_id in hass.data[DOMAIN]["entities"]:
-            return
-
-        device_key = ("thermostat", device_id)
-        device_entry = hass.data[DOMAIN]["known_devices"].setdefault(device_key, {})
-        device_entry[thermostat_id] = {
-            "device_id_raw": device_id_raw,
-            "thermostat_id_raw": thermostat_id_raw,
-            "temperature_state_topic": f"{TOPIC_PREFIX}{device_id_raw}/{THERMOSTAT_SUBTOPIC}/{thermostat_id_raw}/temperatureState",
-            "temperature_detect_topic": f"{TOPIC_PREFIX}{device_id_raw}/{THERMOSTAT_SUBTOPIC}/{thermostat_id_raw}/temperatureDetect",
-            "mode_state_topic": f"{TOPIC_PREFIX}{device_id_raw}/{THERMOSTAT_SUBTOPIC}/{thermostat_id_raw}/modeState",
-            "temperature_set_topic": f"{TOPIC_PREFIX}{device_id_raw}/{THERMOSTAT_SUBTOPIC}/{thermostat_id_raw}/temperatureSet",
-            "mode_set_topic": f"{TOPIC_PREFIX}{device_id_raw}/{THERMOSTAT_SUBTOPIC}/{thermostat_id_raw}/modeSet",
-        }
-
-        await store.async_save(
-            {
-                "devices": hass.data[DOMAIN]["known_devices"],
-                "set_topics": list(hass.data[DOMAIN]["set_topics"]),
-            }
-        )
-
-        hass.data[DOMAIN]["entities"][entity_id] = True
-
-        if "add_climate_entities" in hass.data[DOMAIN]:
-            from .climate import LANBONThermostat
-            new_entity = LANBONThermostat(
-                hass,
-                device_id,
-                thermostat_id,
-                device_id_raw,
-                thermostat_id_raw,
-                device_entry[thermostat_id]["temperature_state_topic"],
-                device_entry[thermostat_id]["temperature_detect_topic"],
-                device_entry[thermostat_id]["mode_state_topic"],
-                device_entry[thermostat_id]["temperature_set_topic"],
-                device_entry[thermostat_id]["mode_set_topic"],
-            )
-            hass.data[DOMAIN]["add_climate_entities"]([new_entity], update_before_add=True)
-
-    # Subscribe to state topics for discovery
-    await mqtt.async_subscribe(hass, f"{TOPIC_PREFIX}+/switch/+/state", discover_switch)
-    await mqtt.async_subscribe(hass, f"{TOPIC_PREFIX}+/thermostat/+/modeState", discover_thermostat)
-    _LOGGER.debug("Subscribed to MQTT topics for discovery")
-
-    # Request device states on startup
-    async def sync_device_states(event):
-        await asyncio.sleep(1)
-        for device_key, device_entry in hass.data[DOMAIN]["known_devices"].items():
-            if isinstance(device_key, tuple) and len(device_key) == 2:
-                device_type, device_id = device_key
-                if device_type == "switch":
-                    for switch_info in device_entry.values():
-                        set_topic = switch_info["set_topic"]
-                        await mqtt.async_publish(hass, set_topic, "OFF", qos=0, retain=False)
-                elif device_type == "thermostat":
-                    for thermostat_info in device_entry.values():
-                        mode_set_topic = thermostat_info["mode_set_topic"]
-                        await mqtt.async_publish(hass, mode_set_topic, "off", qos=0, retain=False)
-
-    hass.bus.async_listen_once("homeassistant_started", sync_device_states)
+    metrics = LanbonMetrics(hass)
+    hass.data[DOMAIN]["metrics"] = metrics
+    dispatcher = LanbonDispatcher(
+        hass, entry.options.get(CONF_TOPIC_PREFIXES, DEFAULT_TOPIC_PREFIXES)
+    )
+    hass.data[DOMAIN]["dispatcher"] = dispatcher
+    commands = LanbonCommandScheduler(hass, metrics=metrics)
+    hass.data[DOMAIN]["commands"] = commands
+    commands.async_setup(dispatcher)
+    acks = LanbonAckTracker(
+        hass,
+        entry.options.get(CONF_ACK_TIMEOUT, DEFAULT_ACK_TIMEOUT),
+        entry.options.get(CONF_ACK_RETRIES, DEFAULT_ACK_RETRIES),
+    )
+    hass.data[DOMAIN]["acks"] = acks
+    acks.async_setup(dispatcher)
+    availability = LanbonAvailability(
+        hass, entry.options.get(CONF_AVAILABILITY_TIMEOUT, DEFAULT_AVAILABILITY_TIMEOUT)
+    )
+    hass.data[DOMAIN]["availability"] = availability
+    availability.async_setup(dispatcher)
+    state_sync = LanbonStateSync(
+        hass,
+        entry.options.get(CONF_SYNC_TIMEOUT, DEFAULT_SYNC_TIMEOUT),
+        entry.options.get(CONF_SYNC_RATE, DEFAULT_SYNC_RATE),
+        entry.options.get(CONF_SYNC_CONCURRENCY, DEFAULT_SYNC_CONCURRENCY),
+    )
+    hass.data[DOMAIN]["sync"] = state_sync
+    state_sync.async_setup(dispatcher)
+    capture = LanbonCapture(hass)
+    hass.data[DOMAIN]["capture"] = capture
+    capture.async_setup(dispatcher)
+    async_setup_services(hass)
+
+    # Load known devices from storage, unless a reload kept them in memory
+    if not hass.data[DOMAIN].get("registry_loaded"):
+        hass.data[DOMAIN]["registry"] = await store.async_load()
+        hass.data[DOMAIN]["registry_loaded"] = True
+
+    # Enforce the device cap; silence only counts from now on
+    eviction = LanbonEviction(
+        hass,
+        entry.options.get(CONF_DEVICE_TTL, DEFAULT_DEVICE_TTL) * 86400,
+        entry.options.get(CONF_MAX_DEVICES, DEFAULT_MAX_DEVICES),
+    )
+    hass.data[DOMAIN]["eviction"] = eviction
+    eviction.async_sweep()
+    eviction.async_setup(dispatcher)
+
+    # Forward setup to the platforms of the known device types and the
+    # diagnostic sensors; discovery loads the others when first needed
+    registry = hass.data[DOMAIN]["registry"]
+    platforms = [
+        CHANNEL_TYPES[kind].platform for kind in DEVICE_TYPES if len(registry.panels(kind))
+    ] + ALWAYS_PLATFORMS
+    hass.data[DOMAIN]["platforms"] = set(platforms)
+    _LOGGER.debug("Forwarding entry setup for %s", platforms)
+    await hass.config_entries.async_forward_entry_setups(entry, platforms)
+
+    # Discovery and entity updates share the dispatcher's subscriptions
+    discovery = LanbonDiscovery(hass, entry)
+    hass.data[DOMAIN]["discovery"] = discovery
+    discovery.async_setup(dispatcher)
+    await dispatcher.async_subscribe()
+
+    # Hydrate states from retained messages, then probe silent channels.
+    # On a reload Home Assistant is already running and the sync starts now.
+    @callback
+    def sync_device_states(hass):
+        state_sync.async_start()
+
+    entry.async_on_unload(async_at_started(hass, sync_device_states))
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
     return True
 
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the integration when its options change."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload the integration."""
-    unload_ok = await hass.config_entries.async_forward_entry_unload(entry, "switch")
-    unload_ok = unload_ok and await hass.config_entries.async_forward_entry_unload(entry, "climate")
+    data = hass.data[DOMAIN]
+    if "discovery" in data:
+        await data["discovery"].async_wait_platforms()
+    unload_ok = True
+    for platform in PLATFORMS:
+        if platform in data.get("platforms", PLATFORMS):
+            unload_ok = unload_ok and await hass.config_entries.async_forward_entry_unload(entry, platform)
     if unload_ok:
-        hass.data.pop(DOMAIN, None)
+        async_unload_services(hass)
+        if "dispatcher" in data:
+            data["dispatcher"].async_unsubscribe()
+        if "discovery" in data:
+            data["discovery"].async_shutdown()
+        if "sync" in data:
+            data["sync"].async_shutdown()
+        if "commands" in data:
+            data["commands"].async_shutdown()
+        if "acks" in data:
+            data["acks"].async_shutdown()
+        if "availability" in data:
+            data["availability"].async_shutdown()
+        if "eviction" in data:
+            data["eviction"].async_shutdown()
+        if "store" in data:
+            await data["store"].async_flush()
+        if "metrics" in data:
+            await data["metrics"].async_shutdown()
+        if "capture" in data:
+            await data["capture"].async_shutdown()
+        # Storage is up to date now: keep only the registry for a reload
+        hass.data[DOMAIN] = {
+            "registry": data["registry"],
+            "registry_loaded": data.get("registry_loaded", False),
+            "stats": data["stats"],
+        }
     return unload_ok
+
+async def async_remove_config_entry_device(
+    hass: HomeAssistant, entry: ConfigEntry, device_entry: dr.DeviceEntry
+) -> bool:
+    """Forget a device deleted in the UI, so it isn't recreated at startup."""
+    data = hass.data[DOMAIN]
+    device_ids = {identifier for domain, identifier in device_entry.identifiers if domain == DOMAIN}
+    for panel in [panel for panel in data["registry"].panels() if panel.device_id in device_ids]:
+        data["eviction"].async_forget(panel)
+    return True
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Drop the registry kept in memory for reloads."""
+    hass.data.pop(DOMAIN, None)
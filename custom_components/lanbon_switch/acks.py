@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import statistics
+import time
+from collections import deque
+from typing import Awaitable, Callable
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .const import DEFAULT_ACK_TIMEOUT, DEFAULT_ACK_RETRIES
+
+_LOGGER = logging.getLogger(__name__)
+
+ACK_BACKOFF = 2
+# Confirmation latencies kept per device for the percentiles
+ACK_LATENCY_SAMPLES = 100
+
+
+class LanbonAckTracker:
+    """Wait for the device to echo each command, resending it if it doesn't.
+
+    A command is tracked by the channel subtopic its echo arrives on, so a
+    newer command for the same channel supersedes the one being tracked.
+    The echo is waited for ``timeout`` seconds, doubling on every retry.
+    After ``retries`` resends the command is given up on and ``on_give_up``
+    is called to roll back the optimistic state.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        timeout: float = DEFAULT_ACK_TIMEOUT,
+        retries: int = DEFAULT_ACK_RETRIES,
+    ):
+        self.hass = hass
+        self.timeout = timeout
+        self.retries = retries
+        self.confirmed = 0
+        self.retried = 0
+        self.failed = 0
+        self._waiters: dict[tuple[str, str, str], tuple[Callable, asyncio.Future]] = {}
+        self._tasks: dict[tuple[str, str, str], asyncio.Task] = {}
+        self._latencies: dict[str, deque] = {}
+        self._remove_listener: CALLBACK_TYPE | None = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    @callback
+    def async_setup(self, dispatcher):
+        self._remove_listener = dispatcher.async_add_listener(self._message_received)
+
+    @callback
+    def async_shutdown(self):
+        if self._remove_listener is not None:
+            self._remove_listener()
+            self._remove_listener = None
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+        self._waiters.clear()
+
+    @callback
+    def async_forget(self, device_id_raw: str):
+        self._latencies.pop(device_id_raw, None)
+
+    @callback
+    def async_track(
+        self,
+        device_id_raw: str,
+        channel_id_raw: str,
+        subtopic: str,
+        matches: Callable[[str], bool],
+        resend: Callable[[], Awaitable],
+        on_give_up: Callable[[], None],
+    ):
+        """Track a command that is about to be sent.
+
+        ``matches`` tells whether a raw payload on ``subtopic`` confirms it and
+        ``resend`` publishes it again.
+        """
+        key = (device_id_raw, channel_id_raw, subtopic)
+        previous = self._tasks.pop(key, None)
+        if previous is not None:
+            previous.cancel()
+        waiter = self.hass.loop.create_future()
+        self._waiters[key] = (matches, waiter)
+        self._tasks[key] = self.hass.async_create_background_task(
+            self._async_confirm(key, waiter, resend, on_give_up),
+            f"lanbon_switch ack {device_id_raw}/{channel_id_raw}",
+        )
+
+    async def _async_confirm(self, key, waiter, resend, on_give_up):
+        start = time.monotonic()
+        try:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    self.retried += 1
+                    _LOGGER.debug("No echo from %s/%s, resending (attempt %d)", *key[:2], attempt + 1)
+                    try:
+                        await resend()
+                    except Exception as err:  # pylint: disable=broad-except
+                        _LOGGER.debug("Resend to %s/%s failed: %s", *key[:2], err)
+                try:
+                    await asyncio.wait_for(
+                        asyncio.shield(waiter), self.timeout * ACK_BACKOFF**attempt
+                    )
+                except asyncio.TimeoutError:
+                    continue
+                self.confirmed += 1
+                latencies = self._latencies.get(key[0])
+                if latencies is None:
+                    latencies = self._latencies[key[0]] = deque(maxlen=ACK_LATENCY_SAMPLES)
+                latencies.append(time.monotonic() - start)
+                return
+
+            self.failed += 1
+            _LOGGER.warning(
+                "%s/%s did not confirm a command after %d attempts, rolling back",
+                key[0],
+                key[1],
+                self.retries + 1,
+            )
+            on_give_up()
+        finally:
+            if self._waiters.get(key, (None, None))[1] is waiter:
+                del self._waiters[key]
+            if self._tasks.get(key) is asyncio.current_task():
+                del self._tasks[key]
+
+    @callback
+    def _message_received(self, device_id_raw, channel_id_raw, subtopic, msg):
+        tracked = self._waiters.get((device_id_raw, channel_id_raw, subtopic))
+        if tracked is None:
+            return
+        matches, waiter = tracked
+        if not waiter.done() and matches(msg.payload):
+            waiter.set_result(None)
+
+    def latency_percentiles(self) -> dict:
+        """Return confirmation latency percentiles in ms for every device."""
+        result = {}
+        for device_id_raw, latencies in self._latencies.items():
+            ordered = sorted(latencies)
+            quantiles = statistics.quantiles(ordered, n=100) if len(ordered) > 1 else ordered * 99
+            result[device_id_raw] = {
+                "count": len(ordered),
+                "p50_ms": round(quantiles[49] * 1000, 1),
+                "p90_ms": round(quantiles[89] * 1000, 1),
+                "p99_ms": round(quantiles[98] * 1000, 1),
+                "max_ms": round(ordered[-1] * 1000, 1),
+            }
+        return result
+
+    def as_dict(self) -> dict:
+        return {
+            "confirmed": self.confirmed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "pending": self.pending,
+            "latency": self.latency_percentiles(),
+        }
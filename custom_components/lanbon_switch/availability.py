@@ -0,0 +1,139 @@
+import asyncio
+import heapq
+import logging
+from typing import Callable
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .const import DEFAULT_AVAILABILITY_TIMEOUT, STATE_SUBTOPICS
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class LanbonAvailability:
+    """Mark devices unavailable after ``timeout`` seconds without a message.
+
+    Every state message only stores its device's last-seen time. Deadlines live
+    in one heap served by a single loop timer for the whole integration:
+    when an entry comes due, a device that was heard from in the meantime
+    is pushed back with its new deadline, and a silent one expires. The
+    next message from an expired device makes it available again.
+    """
+
+    def __init__(self, hass: HomeAssistant, timeout: float = DEFAULT_AVAILABILITY_TIMEOUT):
+        self.hass = hass
+        self.timeout = timeout
+        self._last_seen: dict[str, float] = {}
+        self._heap: list[tuple[float, str]] = []
+        self._expired: set[str] = set()
+        self._listeners: dict[str, list[Callable[[], None]]] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._remove_listener: CALLBACK_TYPE | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.timeout > 0
+
+    @property
+    def unavailable(self) -> int:
+        return len(self._expired)
+
+    @callback
+    def async_setup(self, dispatcher):
+        if self.enabled:
+            self._remove_listener = dispatcher.async_add_listener(self._message_received)
+
+    @callback
+    def async_shutdown(self):
+        if self._remove_listener is not None:
+            self._remove_listener()
+            self._remove_listener = None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def is_available(self, device_id_raw: str) -> bool:
+        return device_id_raw not in self._expired
+
+    @callback
+    def async_register(self, device_id_raw: str, listener: Callable[[], None]) -> CALLBACK_TYPE:
+        """Call ``listener`` when the device expires or recovers.
+
+        A device that has not been heard from yet gets a full ``timeout``
+        from now before it expires.
+        """
+        listeners = self._listeners.setdefault(device_id_raw, [])
+        listeners.append(listener)
+        if self.enabled and device_id_raw not in self._last_seen:
+            self._track(device_id_raw, self.hass.loop.time())
+
+        @callback
+        def unregister():
+            listeners.remove(listener)
+            if not listeners:
+                del self._listeners[device_id_raw]
+
+        return unregister
+
+    @callback
+    def async_forget(self, device_id_raw: str):
+        """Stop tracking an evicted device; its heap entry is dropped when due."""
+        self._last_seen.pop(device_id_raw, None)
+        self._expired.discard(device_id_raw)
+
+    def _track(self, device_id_raw: str, now: float):
+        self._last_seen[device_id_raw] = now
+        # Deadlines are pushed in time order, so an armed timer is never later
+        heapq.heappush(self._heap, (now + self.timeout, device_id_raw))
+        if self._timer is None:
+            self._timer = self.hass.loop.call_at(now + self.timeout, self._async_expire)
+
+    @callback
+    def _message_received(self, device_id_raw, channel_id_raw, subtopic, msg):
+        if subtopic not in STATE_SUBTOPICS:
+            # Our own thermostat commands say nothing about the device
+            return
+        if device_id_raw in self._expired:
+            self._expired.discard(device_id_raw)
+            self._track(device_id_raw, self.hass.loop.time())
+            _LOGGER.info("LANBON device %s is available again", device_id_raw)
+            self._notify(device_id_raw)
+        elif device_id_raw in self._last_seen:
+            self._last_seen[device_id_raw] = self.hass.loop.time()
+        else:
+            self._track(device_id_raw, self.hass.loop.time())
+
+    @callback
+    def _async_expire(self):
+        self._timer = None
+        now = self.hass.loop.time()
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, device_id_raw = heapq.heappop(heap)
+            last_seen = self._last_seen.get(device_id_raw)
+            if last_seen is None:
+                continue
+            deadline = last_seen + self.timeout
+            if deadline > now:
+                heapq.heappush(heap, (deadline, device_id_raw))
+                continue
+            self._expired.add(device_id_raw)
+            _LOGGER.info(
+                "LANBON device %s has been silent for %s s, marking it unavailable",
+                device_id_raw,
+                self.timeout,
+            )
+            self._notify(device_id_raw)
+        if heap:
+            self._timer = self.hass.loop.call_at(heap[0][0], self._async_expire)
+
+    def _notify(self, device_id_raw: str):
+        for listener in list(self._listeners.get(device_id_raw, ())):
+            listener()
+
+    def as_dict(self) -> dict:
+        return {
+            "timeout": self.timeout,
+            "devices": len(self._last_seen),
+            "unavailable": sorted(self._expired),
+        }
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import os
+import struct
+import time
+from datetime import timedelta
+from typing import Iterator
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.event import async_call_later, async_track_time_interval
+
+_LOGGER = logging.getLogger(__name__)
+
+CAPTURE_MAGIC = b"LANBONCAP1\n"
+# Wall-clock time, retain flag, topic length, payload length
+_RECORD = struct.Struct("<d?HI")
+# Buffered records are written from the executor this often
+CAPTURE_FLUSH_INTERVAL = timedelta(seconds=1)
+
+
+class _CaptureWriter:
+    """Append records to a capture file, rotating it like a log file.
+
+    Runs in the executor. Each file starts with ``CAPTURE_MAGIC``, so a
+    rotated file can be read on its own.
+    """
+
+    def __init__(self, path: str, max_bytes: int, backups: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.written = 0
+        self._file = None
+        self._size = 0
+
+    def open(self):
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+        if not self._size:
+            self._file.write(CAPTURE_MAGIC)
+            self._size = len(CAPTURE_MAGIC)
+
+    def write(self, records: list[bytes]):
+        chunk = b"".join(records)
+        if self._size > len(CAPTURE_MAGIC) and self._size + len(chunk) > self.max_bytes:
+            self._rotate()
+        self._file.write(chunk)
+        self._file.flush()
+        self._size += len(chunk)
+        self.written += len(chunk)
+
+    def _rotate(self):
+        self._file.close()
+        if self.backups:
+            for index in range(self.backups - 1, 0, -1):
+                source = f"{self.path}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.open()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def capture_files(path: str) -> list[str]:
+    """Return ``path`` and its rotated files, oldest first."""
+    files = [path]
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        files.insert(0, f"{path}.{index}")
+        index += 1
+    return [file for file in files if os.path.exists(file)]
+
+
+def read_capture(path: str) -> Iterator[tuple[float, str, bytes, bool]]:
+    """Yield ``(timestamp, topic, payload, retain)`` for every record in ``path``."""
+    with open(path, "rb") as file:
+        if file.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise ValueError(f"{path} is not a LANBON capture")
+        while True:
+            header = file.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                # A capture cut short by a crash ends with a partial record
+                return
+            timestamp, retain, topic_length, payload_length = _RECORD.unpack(header)
+            topic = file.read(topic_length)
+            payload = file.read(payload_length)
+            if len(payload) < payload_length:
+                return
+            yield timestamp, topic.decode("utf-8"), payload, retain
+
+
+class LanbonCapture:
+    """Record the MQTT traffic the dispatcher routes to a capture file.
+
+    Every message is stored as a length-prefixed binary record with its
+    wall-clock time, topic, raw payload and retain flag. Records are
+    buffered on the loop and written from the executor once a second, so
+    a capture costs each message one ``struct.pack``. Nothing listens
+    while no capture runs.
+
+    ``benchmarks/replay.py`` feeds a capture back through the integration.
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        self.hass = hass
+        self.records = 0
+        self._dispatcher = None
+        self._writer: _CaptureWriter | None = None
+        self._buffer: list[bytes] = []
+        self._lock = asyncio.Lock()
+        self._remove_listener: CALLBACK_TYPE | None = None
+        self._cancel_flush: CALLBACK_TYPE | None = None
+        self._cancel_stop: CALLBACK_TYPE | None = None
+
+    @property
+    def capturing(self) -> bool:
+        return self._writer is not None
+
+    @callback
+    def async_setup(self, dispatcher):
+        self._dispatcher = dispatcher
+
+    async def async_start(self, path: str, duration: float, max_bytes: int, backups: int):
+        """Capture for ``duration`` seconds into ``path``, rotating at ``max_bytes``."""
+        if self._writer is not None:
+            raise HomeAssistantError(f"A capture is already being written to {self._writer.path}")
+        writer = _CaptureWriter(path, max_bytes, backups)
+        await self.hass.async_add_executor_job(writer.open)
+        _LOGGER.info("Capturing LANBON MQTT traffic for %s s into %s", duration, path)
+        self._writer = writer
+        self.records = 0
+        self._remove_listener = self._dispatcher.async_add_listener(self._message_received)
+        self._cancel_flush = async_track_time_interval(
+            self.hass, self._async_flush, CAPTURE_FLUSH_INTERVAL
+        )
+        self._cancel_stop = async_call_later(self.hass, duration, self._async_stop)
+
+    @callback
+    def _message_received(self, device_id_raw, channel_id_raw, subtopic, msg):
+        topic = msg.topic.encode("utf-8")
+        payload = msg.payload
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        self._buffer.append(
+            _RECORD.pack(time.time(), msg.retain, len(topic), len(payload)) + topic + payload
+        )
+
+    async def _async_flush(self, _now=None):
+        async with self._lock:
+            if not self._buffer or self._writer is None:
+                return
+            records, self._buffer = self._buffer, []
+            self.records += len(records)
+            await self.hass.async_add_executor_job(self._writer.write, records)
+
+    async def _async_stop(self, _now=None):
+        self._cancel_stop = None
+        if self._writer is None:
+            return
+        if self._remove_listener is not None:
+            self._remove_listener()
+            self._remove_listener = None
+        if self._cancel_flush is not None:
+            self._cancel_flush()
+            self._cancel_flush = None
+        await self._async_flush()
+        writer, self._writer = self._writer, None
+        await self.hass.async_add_executor_job(writer.close)
+        _LOGGER.info(
+            "Wrote %d LANBON MQTT records (%d bytes) to %s",
+            self.records,
+            writer.written,
+            writer.path,
+        )
+
+    async def async_shutdown(self):
+        """Finish a running capture early, e.g. when the entry is unloaded."""
+        if self._cancel_stop is not None:
+            self._cancel_stop()
+        await self._async_stop()
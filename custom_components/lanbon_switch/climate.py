@@ -1,80 +1,112 @@
+import time
+from collections import deque
+from datetime import timedelta
+from functools import partial
+from itertools import islice
+
 from homeassistant.components.climate import ClimateEntity, HVACMode
 from homeassistant.components.climate.const import SUPPORT_TARGET_TEMPERATURE
 from homeassistant.const import TEMP_CELSIUS
 from homeassistant.core import callback
 from homeassistant.components import mqtt
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.restore_state import RestoreEntity
 
-from .const import DOMAIN
+from .const import (
+    DOMAIN,
+    THERMOSTAT_SUBTOPIC,
+    MODE_STATE_SUBTOPIC,
+    TEMPERATURE_STATE_SUBTOPIC,
+    TEMPERATURE_DETECT_SUBTOPIC,
+    CONF_TEMPERATURE_DEADBAND,
+    DEFAULT_TEMPERATURE_DEADBAND,
+    CONF_TEMPERATURE_MIN_INTERVAL,
+    DEFAULT_TEMPERATURE_MIN_INTERVAL,
+    CONF_TEMPERATURE_PERIOD,
+    DEFAULT_TEMPERATURE_PERIOD,
+)
+from .metrics import PUBLISH_THERMOSTAT, THERMOSTAT_MESSAGE_RECEIVED
+from .panel import async_get_panel
+from .payloads import THERMOSTAT_MODE_PAYLOADS, parse_float, parse_mode, text
+from .registry import ThermostatChannel
 
 import logging
 
 _LOGGER = logging.getLogger(__name__)
 
+# Readings kept per thermostat; a period with more is aggregated over the latest
+TEMPERATURE_BUFFER_SIZE = 64
+
+def _matches_temperature(temperature, payload):
+    reported = parse_float(payload)
+    return reported is not None and abs(reported - temperature) < 0.05
+
 async def async_setup_entry(hass, entry, async_add_entities):
     """Set up climate entities for a config entry."""
-    known_devices = hass.data[DOMAIN].get("known_devices", {})
+    registry = hass.data[DOMAIN]["registry"]
     entities = []
+    debug = _LOGGER.isEnabledFor(logging.DEBUG)
 
-    for device_key, device_info in known_devices.items():
-        if isinstance(device_key, tuple) and len(device_key) == 2:
-            device_type, device_id = device_key
-            if device_type == "thermostat":
-                for thermostat_id, thermostat_info in device_info.items():
-                    _LOGGER.debug("Adding thermostat entity for device: %s, thermostat: %s", device_id, thermostat_id)
-                    entities.append(
-                        LANBONThermostat(
-                            hass,
-                            device_id,
-                            thermostat_id,
-                            thermostat_info["device_id_raw"],
-                            thermostat_info["thermostat_id_raw"],
-                            thermostat_info["temperature_state_topic"],
-                            thermostat_info["temperature_detect_topic"],
-                            thermostat_info["mode_state_topic"],
-                            thermostat_info["temperature_set_topic"],
-                            thermostat_info["mode_set_topic"],
-                        )
-                    )
-    async_add_entities(entities, update_before_add=True)
+    for channel in registry.channels(THERMOSTAT_SUBTOPIC):
+        if debug:
+            _LOGGER.debug("Adding thermostat entity for device: %s, thermostat: %s", channel.device_id, channel.channel_id)
+        entities.append(LANBONThermostat(hass, channel))
+    # State arrives over MQTT, there is nothing to poll before adding
+    async_add_entities(entities)
     hass.data[DOMAIN]["add_climate_entities"] = async_add_entities
+    # Channels discovery still has queued were just created from the registry
+    discovery = hass.data[DOMAIN].get("discovery")
+    if discovery is not None:
+        discovery.async_drop_queued(THERMOSTAT_SUBTOPIC)
+
+    options = entry.options if entry is not None else {}
+    period = options.get(CONF_TEMPERATURE_PERIOD, DEFAULT_TEMPERATURE_PERIOD)
+    if period:
+        # One timer publishes the aggregated readings of every thermostat
+        @callback
+        def publish_temperatures(_now):
+            for channel in registry.channels(THERMOSTAT_SUBTOPIC):
+                if channel.entity is not None:
+                    channel.entity.async_publish_temperature()
 
-class LANBONThermostat(ClimateEntity):
-    def __init__(
-        self,
-        hass,
-        device_id,
-        thermostat_id,
-        device_id_raw,
-        thermostat_id_raw,
-        temperature_state_topic,
-        temperature_detect_topic,
-        mode_state_topic,
-        temperature_set_topic,
-        mode_set_topic,
-    ):
+        entry.async_on_unload(
+            async_track_time_interval(hass, publish_temperatures, timedelta(seconds=period))
+        )
+
+class LANBONThermostat(ClimateEntity, RestoreEntity):
+    def __init__(self, hass, channel: ThermostatChannel):
         self.hass = hass
-        self._device_id = device_id
-        self._thermostat_id = thermostat_id
-        self._device_id_raw = device_id_raw
-        self._thermostat_id_raw = thermostat_id_raw
-        self._temperature_state_topic = temperature_state_topic
-        self._temperature_detect_topic = temperature_detect_topic
-        self._mode_state_topic = mode_state_topic
-        self._temperature_set_topic = temperature_set_topic
-        self._mode_set_topic = mode_set_topic
-        self._unsubscribe = None
+        self._channel = channel
+        self._panel = async_get_panel(hass, channel.panel)
 
         self._target_temperature = None
         self._current_temperature = None
+        self._current_temperature_written = 0.0
+        self._temperature_deadband = DEFAULT_TEMPERATURE_DEADBAND
+        self._temperature_min_interval = DEFAULT_TEMPERATURE_MIN_INTERVAL
+        self._temperature_period = DEFAULT_TEMPERATURE_PERIOD
+        # Readings not yet published are the newest _temperature_pending ones
+        self._temperature_readings = deque(maxlen=TEMPERATURE_BUFFER_SIZE)
+        self._temperature_pending = 0
+        self._temperature_statistics = None
         self._mode = None
+        self.suppressed_writes = 0
 
     @property
     def unique_id(self):
-        return f"lanbon_thermostat_{self._device_id}_{self._thermostat_id}"
+        return self._channel.unique_id
+
+    @property
+    def device_info(self):
+        return self._panel.device_info
 
     @property
     def name(self):
-        return f"LANBON Thermostat {self._device_id_raw} {self._thermostat_id_raw}"
+        return f"LANBON Thermostat {self._channel.route_id} {self._channel.channel_id_raw}"
+
+    @property
+    def available(self):
+        return self.hass.data[DOMAIN]["availability"].is_available(self._channel.route_id)
 
     @property
     def temperature_unit(self):
@@ -104,44 +136,197 @@ class LANBONThermostat(ClimateEntity):
     def supported_features(self):
         return SUPPORT_TARGET_TEMPERATURE
 
+    @property
+    def extra_state_attributes(self):
+        return self._temperature_statistics
+
+    async def _async_publish(self, topic, payload):
+        with self.hass.data[DOMAIN]["metrics"].timer(PUBLISH_THERMOSTAT):
+            await mqtt.async_publish(self.hass, topic, payload, qos=0, retain=False)
+
+    async def _async_send(self, topic, payload, echo_subtopic, matches, rollback):
+        """Publish a command and resend it until its echo arrives on ``echo_subtopic``."""
+        channel = self._channel
+        self.hass.data[DOMAIN]["acks"].async_track(
+            channel.route_id,
+            channel.channel_id_raw,
+            echo_subtopic,
+            matches,
+            partial(self._async_publish, topic, payload),
+            rollback,
+        )
+        await self._async_publish(topic, payload)
+
     async def async_set_temperature(self, **kwargs):
         temperature = kwargs.get("temperature")
         if temperature is not None:
-            await mqtt.async_publish(self.hass, self._temperature_set_topic, str(temperature), qos=0, retain=False)
+            previous = self._target_temperature
+
+            @callback
+            def rollback():
+                if self._target_temperature == temperature:
+                    self._target_temperature = previous
+                    self.async_write_ha_state()
+
+            await self._async_send(
+                self._channel.temperature_set_topic,
+                str(temperature),
+                TEMPERATURE_STATE_SUBTOPIC,
+                partial(_matches_temperature, temperature),
+                rollback,
+            )
             self._target_temperature = temperature
             self.async_write_ha_state()
 
     async def async_set_hvac_mode(self, hvac_mode):
         mode = "off" if hvac_mode == HVACMode.OFF else "auto"
-        await mqtt.async_publish(self.hass, self._mode_set_topic, mode, qos=0, retain=False)
+        previous = self._mode
+
+        @callback
+        def rollback():
+            if self._mode == mode:
+                self._mode = previous
+                self.async_write_ha_state()
+
+        await self._async_send(
+            self._channel.mode_set_topic,
+            mode,
+            MODE_STATE_SUBTOPIC,
+            THERMOSTAT_MODE_PAYLOADS[mode].__eq__,
+            rollback,
+        )
         self._mode = mode
         self.async_write_ha_state()
 
+    def _probe(self):
+        # Re-assert the restored mode so the thermostat echoes its current one
+        if self._mode is None:
+            return None
+        return self._async_publish(self._channel.mode_set_topic, self._mode)
+
+    def _update_current_temperature(self, current_temperature):
+        """Store a reading unless it is within the deadband or too soon."""
+        if self._current_temperature is not None:
+            if abs(current_temperature - self._current_temperature) <= self._temperature_deadband:
+                return False
+            now = time.monotonic()
+            if now - self._current_temperature_written < self._temperature_min_interval:
+                return False
+        self._current_temperature = current_temperature
+        self._current_temperature_written = time.monotonic()
+        return True
+
+    def _buffer_current_temperature(self, current_temperature):
+        """Keep a reading for the next periodic publish."""
+        self._temperature_readings.append(current_temperature)
+        self._temperature_pending += 1
+        if self._current_temperature is None:
+            # Don't stay unknown for a whole period
+            self.async_publish_temperature()
+            return True
+        return False
+
+    @callback
+    def async_publish_temperature(self):
+        """Publish the mean of the readings since the last publish.
+
+        Their mean, min, max and count go into the attributes, so the
+        recorder stores one aggregate per period instead of every reading.
+        """
+        pending = min(self._temperature_pending, len(self._temperature_readings))
+        if not pending:
+            return
+        self._temperature_pending = 0
+        readings = list(islice(reversed(self._temperature_readings), pending))
+        mean = round(sum(readings) / pending, 2)
+        self._current_temperature = mean
+        self._temperature_statistics = {
+            "temperature_mean": mean,
+            "temperature_min": min(readings),
+            "temperature_max": max(readings),
+            "temperature_samples": pending,
+        }
+        self.async_write_ha_state()
+
     async def async_added_to_hass(self):
+        last_state = await self.async_get_last_state()
+        if last_state is not None:
+            if last_state.state in ("off", "auto"):
+                self._mode = last_state.state
+            target_temperature = last_state.attributes.get("temperature")
+            if target_temperature is not None:
+                self._target_temperature = target_temperature
+
+        options = self.platform.config_entry.options if self.platform else {}
+        self._temperature_deadband = options.get(
+            CONF_TEMPERATURE_DEADBAND, DEFAULT_TEMPERATURE_DEADBAND
+        )
+        self._temperature_min_interval = options.get(
+            CONF_TEMPERATURE_MIN_INTERVAL, DEFAULT_TEMPERATURE_MIN_INTERVAL
+        )
+        self._temperature_period = options.get(
+            CONF_TEMPERATURE_PERIOD, DEFAULT_TEMPERATURE_PERIOD
+        )
+
         @callback
-        def message_received(msg):
-            if msg.topic == self._temperature_state_topic:
-                try:
-                    self._target_temperature = float(msg.payload)
-                except ValueError:
-                    _LOGGER.error("Invalid temperature state payload: %s", msg.payload)
-            elif msg.topic == self._temperature_detect_topic:
-                try:
-                    self._current_temperature = float(msg.payload)
-                except ValueError:
-                    _LOGGER.error("Invalid temperature detect payload: %s", msg.payload)
-            elif msg.topic == self._mode_state_topic:
-                self._mode = msg.payload
-            self.async_write_ha_state()
+        def written(changed):
+            if changed:
+                self.async_write_ha_state()
+            else:
+                self.suppressed_writes += 1
+                self.hass.data[DOMAIN]["stats"]["thermostat_suppressed_writes"] += 1
+
+        # One handler per subtopic, so none of them compares topics
+        @callback
+        def temperature_state_received(msg):
+            target_temperature = parse_float(msg.payload)
+            if target_temperature is None:
+                _LOGGER.error("Invalid temperature state payload: %s", text(msg.payload))
+                return
+            changed = target_temperature != self._target_temperature
+            self._target_temperature = target_temperature
+            written(changed)
+
+        @callback
+        def temperature_detect_received(msg):
+            current_temperature = parse_float(msg.payload)
+            if current_temperature is None:
+                _LOGGER.error("Invalid temperature detect payload: %s", text(msg.payload))
+                return
+            if self._temperature_period:
+                if not self._buffer_current_temperature(current_temperature):
+                    written(False)
+                return
+            written(self._update_current_temperature(current_temperature))
+
+        @callback
+        def mode_state_received(msg):
+            mode = parse_mode(msg.payload)
+            changed = mode != self._mode
+            self._mode = mode
+            written(changed)
 
-        self._unsubscribe = await mqtt.async_subscribe(
-            self.hass,
-            [self._temperature_state_topic, self._temperature_detect_topic, self._mode_state_topic],
-            message_received,
-            qos=0,
+        channel = self._channel
+        metrics = self.hass.data[DOMAIN]["metrics"]
+        for subtopic, handler in (
+            (TEMPERATURE_STATE_SUBTOPIC, temperature_state_received),
+            (TEMPERATURE_DETECT_SUBTOPIC, temperature_detect_received),
+            (MODE_STATE_SUBTOPIC, mode_state_received),
+        ):
+            self.async_on_remove(
+                self._panel.async_register(
+                    channel.channel_id_raw,
+                    subtopic,
+                    metrics.wrap(THERMOSTAT_MESSAGE_RECEIVED, handler),
+                )
+            )
+        self.async_on_remove(self._panel.async_add_entity(self))
+        self.async_on_remove(
+            self.hass.data[DOMAIN]["sync"].async_register(
+                channel.route_id, channel.channel_id_raw, self._probe
+            )
         )
+        self.hass.data[DOMAIN]["registry"].bind(channel, self)
 
     async def async_will_remove_from_hass(self):
-        if self._unsubscribe:
-            self._unsubscribe()
-            self._unsubscribe = None
+        self.hass.data[DOMAIN]["registry"].unbind(self._channel)
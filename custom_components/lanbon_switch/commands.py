@@ -0,0 +1,465 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+from homeassistant.components import mqtt
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .const import STATE_SUBTOPIC
+from .metrics import PUBLISH_SWITCH, LanbonMetrics
+from .payloads import SWITCH_STATE_PAYLOADS
+
+_LOGGER = logging.getLogger(__name__)
+
+# Delays between the publishes of the L8-HS4 gang-4 workaround. Gang 4
+# never reports its state, so its two steps always wait these; the gang-1
+# toggle waits for the panel's echo when it gives one
+GANG4_ON_DELAYS = (0.01, 0.01, 0.01)
+GANG4_OFF_DELAYS = (0.3, 0.1, 0.3)
+# Longest wait for the gang-1 echo, and for an echo that came after its wait
+GANG4_ECHO_TIMEOUT = 1.0
+# The gang-1 echo is waited for this many times its learned latency
+GANG4_ECHO_FACTOR = 3
+# Weight of a new sample in the learned latency
+GANG4_LATENCY_WEIGHT = 0.2
+# Missed echoes in a row after which a step falls back to its fixed delay
+GANG4_SILENT_AFTER = 3
+
+
+class SwitchCommand:
+    """A pending state change for one switch channel."""
+
+    __slots__ = (
+        "topic_set",
+        "state",
+        "gang1_id_raw",
+        "gang1_topic_set",
+        "gang1_state",
+        "gang1_topic_state",
+        "waiters",
+    )
+
+    def __init__(
+        self,
+        topic_set: str,
+        state: str,
+        gang1_id_raw: str | None = None,
+        gang1_topic_set: str | None = None,
+        gang1_state: Callable[[], str | None] | None = None,
+        gang1_topic_state: str | None = None,
+    ):
+        self.topic_set = topic_set
+        self.state = state
+        self.gang1_id_raw = gang1_id_raw
+        self.gang1_topic_set = gang1_topic_set
+        self.gang1_state = gang1_state
+        # Where the gang-4 workaround waits for gang 1's echoes
+        self.gang1_topic_state = gang1_topic_state
+        self.waiters: list[asyncio.Future] = []
+
+
+class _Gang4Timing:
+    """Learned echo latency of the three gang-4 steps of one panel.
+
+    Only step 1, the gang-1 toggle, is ever echoed: gang 4 doesn't report
+    its state, so steps 0 and 2 keep their fixed delays.
+    """
+
+    __slots__ = ("latency", "misses")
+
+    def __init__(self):
+        self.latency: list[float | None] = [None, None, None]
+        self.misses = [0, 0, 0]
+
+    def timeout(self, step: int, delay: float) -> float:
+        """Return how long to wait for the echo of ``step``."""
+        if self.misses[step] >= GANG4_SILENT_AFTER:
+            # The panel doesn't echo this step, an early echo still ends the wait
+            return delay
+        latency = self.latency[step]
+        if latency is None:
+            # Nothing learned yet, e.g. after a restart: wait no longer than
+            # without echoes, a slower echo is still learned from
+            return delay
+        return min(max(latency * GANG4_ECHO_FACTOR, delay), GANG4_ECHO_TIMEOUT)
+
+    def record(self, step: int, latency: float | None):
+        """Record the echo latency of ``step``, None if it never came."""
+        if latency is None:
+            self.misses[step] += 1
+            return
+        self.misses[step] = 0
+        previous = self.latency[step]
+        if previous is None:
+            self.latency[step] = latency
+        else:
+            self.latency[step] = previous + GANG4_LATENCY_WEIGHT * (latency - previous)
+
+    def as_dict(self) -> dict:
+        return {
+            "latency_ms": [
+                None if latency is None else round(latency * 1000, 1)
+                for latency in self.latency
+            ],
+            "silent_steps": [
+                step for step, misses in enumerate(self.misses) if misses >= GANG4_SILENT_AFTER
+            ],
+        }
+
+
+class _PanelQueue:
+    """Serialize every publish to one panel.
+
+    Commands wait in an insertion-ordered dict keyed by channel, so a newer
+    command for a channel replaces the one still waiting to be sent.
+    """
+
+    def __init__(self, scheduler: "LanbonCommandScheduler", device_id_raw: str):
+        self._scheduler = scheduler
+        self._device_id_raw = device_id_raw
+        self._pending: dict[str, SwitchCommand] = {}
+        self._last_sent: dict[str, str] = {}
+        # Gang-1 channel -> echo of the state its toggle cycle restored
+        self._restoring: dict[str, asyncio.Future] = {}
+        self._worker: asyncio.Task | None = None
+
+    @property
+    def idle(self) -> bool:
+        return self._worker is None and not self._pending and not self._restoring
+
+    @callback
+    def async_submit(self, channel_id_raw: str, command: SwitchCommand) -> asyncio.Future:
+        waiter = self._scheduler.hass.loop.create_future()
+        previous = self._pending.pop(channel_id_raw, None)
+        if previous is not None:
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug(
+                    "Merging %s command for %s into %s",
+                    previous.state,
+                    channel_id_raw,
+                    command.state,
+                )
+            command.waiters.extend(previous.waiters)
+        command.waiters.append(waiter)
+        self._pending[channel_id_raw] = command
+
+        if self._worker is None:
+            self._worker = self._scheduler.hass.async_create_task(self._async_run())
+        return waiter
+
+    async def _async_run(self):
+        try:
+            await asyncio.sleep(self._scheduler.merge_window)
+            while self._pending:
+                batch = self._pending
+                self._pending = {}
+                try:
+                    await self._async_execute(batch)
+                except asyncio.CancelledError:
+                    self._cancel_waiters(batch)
+                    raise
+                except Exception as err:  # pylint: disable=broad-except
+                    _LOGGER.error("Failed to send commands to %s: %s", self._device_id_raw, err)
+                    for command in batch.values():
+                        for waiter in command.waiters:
+                            if not waiter.done():
+                                waiter.set_exception(err)
+                    continue
+                for command in batch.values():
+                    for waiter in command.waiters:
+                        if not waiter.done():
+                            waiter.set_result(command.state)
+        finally:
+            self._worker = None
+            self._scheduler.async_release(self._device_id_raw)
+
+    @callback
+    def async_cancel(self):
+        """Drop the waiting commands and stop the worker, e.g. on unload."""
+        pending, self._pending = self._pending, {}
+        self._cancel_waiters(pending)
+        for echo in list(self._restoring.values()):
+            echo.cancel()
+        if self._worker is not None:
+            self._worker.cancel()
+
+    @staticmethod
+    def _cancel_waiters(batch: dict[str, SwitchCommand]):
+        for command in batch.values():
+            for waiter in command.waiters:
+                waiter.cancel()
+
+    async def _async_execute(self, batch: dict[str, SwitchCommand]):
+        """Send a batch of commands in one pass.
+
+        Regular channels are published together. All gang-4 changes share a
+        single gang-1 toggle cycle, run after the regular channels so gang 1
+        is restored to the state just commanded for it.
+        """
+        publish = self._scheduler.async_publish
+        regular = []
+        gang4 = []
+        for channel_id_raw, command in batch.items():
+            (gang4 if command.gang1_topic_set is not None else regular).append(
+                (channel_id_raw, command)
+            )
+
+        if regular:
+            await asyncio.gather(
+                *(publish(command.topic_set, command.state) for _, command in regular)
+            )
+            for channel_id_raw, command in regular:
+                self._last_sent[channel_id_raw] = command.state
+
+        if not gang4:
+            return
+
+        # gang1 topic -> (toggle payload, state to restore, echo topic, gang1 channel)
+        gang1 = {}
+        for _, command in gang4:
+            gang1_state = self._last_sent.get(command.gang1_id_raw)
+            if gang1_state is None and command.gang1_state is not None:
+                gang1_state = command.gang1_state()
+            gang1[command.gang1_topic_set] = (
+                command.state,
+                (gang1_state or "OFF").upper(),
+                command.gang1_topic_state,
+                command.gang1_id_raw,
+            )
+
+        delays = [
+            GANG4_ON_DELAYS if command.state == "ON" else GANG4_OFF_DELAYS
+            for _, command in gang4
+        ]
+        first, second, third = (max(step) for step in zip(*delays))
+
+        # Gang 4 is never echoed; the gang-1 toggle goes on as soon as it is
+        await self._async_step(0, first, [(command.topic_set, "ON", None) for _, command in gang4])
+        await self._async_step(
+            1, second, [(topic, toggle, echo) for topic, (toggle, _, echo, _) in gang1.items()]
+        )
+        await self._async_step(2, third, [(command.topic_set, "OFF", None) for _, command in gang4])
+        # Back to original state gang1
+        restores = [
+            (topic, restore, echo, gang1_id_raw)
+            for topic, (toggle, restore, echo, gang1_id_raw) in gang1.items()
+            if toggle == "ON" or restore == "ON"
+        ]
+        await asyncio.gather(*(publish(topic, restore) for topic, restore, _, _ in restores))
+        for channel_id_raw, command in gang4:
+            self._last_sent[channel_id_raw] = command.state
+        for _, (_, restore, _, gang1_id_raw) in gang1.items():
+            self._last_sent[gang1_id_raw] = restore
+        for _, restore, echo, gang1_id_raw in restores:
+            self._async_hold(gang1_id_raw, echo, restore)
+
+    @callback
+    def _async_hold(self, channel_id_raw: str, echo_topic: str | None, state: str):
+        """Keep the queue, and gang 1's restored state, until the panel echoes it.
+
+        Until that echo arrives Home Assistant still holds the toggled state,
+        which the next gang-4 command would otherwise restore.
+        """
+        scheduler = self._scheduler
+        if echo_topic is None or not scheduler.listening:
+            return
+        echo = scheduler.async_expect(echo_topic, state)
+        self._restoring[channel_id_raw] = echo
+
+        @callback
+        def release(*_):
+            timer.cancel()
+            scheduler.async_unexpect([(echo_topic, echo)])
+            if self._restoring.get(channel_id_raw) is echo:
+                del self._restoring[channel_id_raw]
+            scheduler.async_release(self._device_id_raw)
+
+        timer = scheduler.hass.loop.call_later(GANG4_ECHO_TIMEOUT, release)
+        echo.add_done_callback(release)
+
+    async def _async_step(
+        self, step: int, delay: float, publishes: list[tuple[str, str, str | None]]
+    ):
+        """Publish ``(topic, payload, echo topic)`` items and wait for their echoes.
+
+        Without echoes to wait for, as for gang 4's own steps or when the
+        scheduler isn't listening to the dispatcher, this waits the fixed
+        ``delay`` instead.
+        """
+        scheduler = self._scheduler
+        echoes = [
+            (echo_topic, scheduler.async_expect(echo_topic, payload))
+            for _, payload, echo_topic in publishes
+            if echo_topic is not None and scheduler.listening
+        ]
+        sent = time.monotonic()
+        await asyncio.gather(
+            *(scheduler.async_publish(topic, payload) for topic, payload, _ in publishes)
+        )
+        if not echoes:
+            await asyncio.sleep(delay)
+            return
+
+        timing = scheduler.gang4_timing(self._device_id_raw)
+        try:
+            done, pending = await asyncio.wait(
+                [echo for _, echo in echoes], timeout=timing.timeout(step, delay)
+            )
+        except asyncio.CancelledError:
+            scheduler.async_unexpect(echoes)
+            raise
+        if not pending:
+            scheduler.async_unexpect(echoes)
+            timing.record(step, max(echo.result() for echo in done) - sent)
+            return
+        scheduler.echo_timeouts += 1
+        timing.record(step, None)
+        scheduler.async_learn_late(echoes, timing, step, sent)
+
+
+class LanbonCommandScheduler:
+    """Own all switch publishes, one ordered queue per panel.
+
+    Panels are independent, so commands to different panels run in
+    parallel while commands to the same panel never interleave.
+
+    Once listening to the dispatcher, the gang-1 toggle of the gang-4
+    workaround waits for the panel's state echo instead of a fixed delay,
+    bounded by a timeout learned from that panel's past echoes. Gang 4
+    itself never reports, so its steps keep their fixed delays.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        publish: Callable[[str, str], Awaitable[None]] | None = None,
+        merge_window: float = 0,
+        metrics: LanbonMetrics | None = None,
+    ):
+        self.hass = hass
+        self.merge_window = merge_window
+        self.metrics = metrics if metrics is not None else LanbonMetrics(hass)
+        self._publish = publish
+        self._panels: dict[str, _PanelQueue] = {}
+        # State topic -> (expected payload, future set to the arrival time)
+        self._echoes: dict[str, tuple[bytes, asyncio.Future]] = {}
+        self._gang4_timing: dict[str, _Gang4Timing] = {}
+        self._remove_listener: CALLBACK_TYPE | None = None
+        self.echo_timeouts = 0
+
+    @property
+    def listening(self) -> bool:
+        return self._remove_listener is not None
+
+    @callback
+    def async_setup(self, dispatcher):
+        self._remove_listener = dispatcher.async_add_listener(self._message_received)
+
+    @callback
+    def _message_received(self, device_id_raw, channel_id_raw, subtopic, msg):
+        if not self._echoes or subtopic != STATE_SUBTOPIC:
+            return
+        expected = self._echoes.get(msg.topic)
+        if expected is not None and expected[0] == msg.payload and not expected[1].done():
+            expected[1].set_result(time.monotonic())
+
+    @callback
+    def async_expect(self, topic: str, state: str) -> asyncio.Future:
+        """Return a future set when ``state`` is echoed on ``topic``."""
+        echo = self.hass.loop.create_future()
+        self._echoes[topic] = (SWITCH_STATE_PAYLOADS[state], echo)
+        return echo
+
+    @callback
+    def async_learn_late(
+        self, echoes: list[tuple[str, asyncio.Future]], timing: _Gang4Timing, step: int, sent: float
+    ):
+        """Record the latency of echoes that arrive after their step moved on.
+
+        They are given up on ``GANG4_ECHO_TIMEOUT`` after ``sent``.
+        """
+
+        def learn(echo: asyncio.Future):
+            if not echo.cancelled():
+                timing.record(step, echo.result() - sent)
+
+        for _, echo in echoes:
+            if not echo.done():
+                echo.add_done_callback(learn)
+        self.hass.loop.call_later(
+            max(sent + GANG4_ECHO_TIMEOUT - time.monotonic(), 0), self.async_unexpect, echoes
+        )
+
+    @callback
+    def async_unexpect(self, echoes: list[tuple[str, asyncio.Future]]):
+        for topic, echo in echoes:
+            if self._echoes.get(topic, (None, None))[1] is echo:
+                del self._echoes[topic]
+
+    def gang4_timing(self, device_id_raw: str) -> _Gang4Timing:
+        timing = self._gang4_timing.get(device_id_raw)
+        if timing is None:
+            timing = self._gang4_timing[device_id_raw] = _Gang4Timing()
+        return timing
+
+    @callback
+    def async_forget(self, device_id_raw: str):
+        self._gang4_timing.pop(device_id_raw, None)
+
+    async def async_publish(self, topic: str, payload: str):
+        with self.metrics.timer(PUBLISH_SWITCH):
+            if self._publish is not None:
+                await self._publish(topic, payload)
+            else:
+                await mqtt.async_publish(self.hass, topic, payload, qos=0, retain=False)
+
+    async def async_set(
+        self, device_id_raw: str, channel_id_raw: str, command: SwitchCommand
+    ) -> str:
+        """Queue ``command`` and return the state finally sent for the channel."""
+        panel = self._panels.get(device_id_raw)
+        if panel is None:
+            panel = self._panels[device_id_raw] = _PanelQueue(self, device_id_raw)
+        return await panel.async_submit(channel_id_raw, command)
+
+    async def async_set_many(
+        self, commands: list[tuple[str, str, SwitchCommand]]
+    ) -> list[str | BaseException]:
+        """Queue ``(device_id_raw, channel_id_raw, command)`` items together.
+
+        Everything for one panel lands in the same batch, so each panel is
+        handled in a single pass.
+        """
+        waiters = []
+        for device_id_raw, channel_id_raw, command in commands:
+            panel = self._panels.get(device_id_raw)
+            if panel is None:
+                panel = self._panels[device_id_raw] = _PanelQueue(self, device_id_raw)
+            waiters.append(panel.async_submit(channel_id_raw, command))
+        return await asyncio.gather(*waiters, return_exceptions=True)
+
+    @callback
+    def async_shutdown(self):
+        if self._remove_listener is not None:
+            self._remove_listener()
+            self._remove_listener = None
+        for panel in list(self._panels.values()):
+            panel.async_cancel()
+
+    def as_dict(self) -> dict:
+        return {
+            "gang4_echo_timeouts": self.echo_timeouts,
+            "gang4_timing": {
+                device_id_raw: timing.as_dict()
+                for device_id_raw, timing in self._gang4_timing.items()
+            },
+        }
+
+    @callback
+    def async_release(self, device_id_raw: str):
+        panel = self._panels.get(device_id_raw)
+        if panel is not None and panel.idle:
+            # Keep the last sent states only while the panel is busy; a
+            # later gang-4 command reads gang 1 from Home Assistant again.
+            del self._panels[device_id_raw]
@@ -1,13 +1,61 @@
+import voluptuous as vol
+
 from homeassistant import config_entries
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import selector
 from homeassistant.helpers.typing import ConfigType
-from .const import DOMAIN
+from .const import (
+    DOMAIN,
+    CONF_SAVE_DELAY,
+    DEFAULT_SAVE_DELAY,
+    CONF_SYNC_TIMEOUT,
+    DEFAULT_SYNC_TIMEOUT,
+    CONF_SYNC_RATE,
+    DEFAULT_SYNC_RATE,
+    CONF_SYNC_CONCURRENCY,
+    DEFAULT_SYNC_CONCURRENCY,
+    CONF_TEMPERATURE_DEADBAND,
+    DEFAULT_TEMPERATURE_DEADBAND,
+    CONF_TEMPERATURE_MIN_INTERVAL,
+    DEFAULT_TEMPERATURE_MIN_INTERVAL,
+    CONF_TEMPERATURE_PERIOD,
+    DEFAULT_TEMPERATURE_PERIOD,
+    CONF_ACK_TIMEOUT,
+    DEFAULT_ACK_TIMEOUT,
+    CONF_ACK_RETRIES,
+    DEFAULT_ACK_RETRIES,
+    CONF_AVAILABILITY_TIMEOUT,
+    DEFAULT_AVAILABILITY_TIMEOUT,
+    CONF_DEVICE_TTL,
+    DEFAULT_DEVICE_TTL,
+    CONF_MAX_DEVICES,
+    DEFAULT_MAX_DEVICES,
+    CONF_TOPIC_PREFIXES,
+    DEFAULT_TOPIC_PREFIXES,
+)
+
+
+def _validate_prefixes(prefixes: list[str]) -> list[str] | None:
+    """Return the prefixes without surrounding slashes, or None if one is invalid."""
+    cleaned = []
+    for prefix in prefixes:
+        prefix = prefix.strip().strip("/")
+        if not prefix or "+" in prefix or "#" in prefix:
+            return None
+        if prefix not in cleaned:
+            cleaned.append(prefix)
+    return cleaned or None
 
 class LanbonSwitchConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for the Lanbon Switch integration."""
 
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        return LanbonSwitchOptionsFlow(config_entry)
+
     async def async_step_user(self, user_input=None):
         """Handle the initial step."""
         if user_input is not None:
@@ -18,3 +66,90 @@ class LanbonSwitchConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             step_id="user",
             data_schema=None,  # Replace `None` with a schema if you need user input
         )
+
+class LanbonSwitchOptionsFlow(config_entries.OptionsFlow):
+    """Handle options for the Lanbon Switch integration."""
+
+    def __init__(self, config_entry):
+        self._config_entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        """Manage the integration options."""
+        errors = {}
+        if user_input is not None:
+            prefixes = _validate_prefixes(
+                user_input.get(CONF_TOPIC_PREFIXES, DEFAULT_TOPIC_PREFIXES)
+            )
+            if prefixes is not None:
+                return self.async_create_entry(
+                    title="", data={**user_input, CONF_TOPIC_PREFIXES: prefixes}
+                )
+            errors[CONF_TOPIC_PREFIXES] = "invalid_topic_prefix"
+
+        options = self._config_entry.options
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(
+                        CONF_SAVE_DELAY,
+                        default=options.get(CONF_SAVE_DELAY, DEFAULT_SAVE_DELAY),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                    vol.Optional(
+                        CONF_SYNC_TIMEOUT,
+                        default=options.get(CONF_SYNC_TIMEOUT, DEFAULT_SYNC_TIMEOUT),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                    vol.Optional(
+                        CONF_SYNC_RATE,
+                        default=options.get(CONF_SYNC_RATE, DEFAULT_SYNC_RATE),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0.1)),
+                    vol.Optional(
+                        CONF_SYNC_CONCURRENCY,
+                        default=options.get(CONF_SYNC_CONCURRENCY, DEFAULT_SYNC_CONCURRENCY),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                    vol.Optional(
+                        CONF_TEMPERATURE_DEADBAND,
+                        default=options.get(
+                            CONF_TEMPERATURE_DEADBAND, DEFAULT_TEMPERATURE_DEADBAND
+                        ),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                    vol.Optional(
+                        CONF_TEMPERATURE_MIN_INTERVAL,
+                        default=options.get(
+                            CONF_TEMPERATURE_MIN_INTERVAL, DEFAULT_TEMPERATURE_MIN_INTERVAL
+                        ),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                    vol.Optional(
+                        CONF_TEMPERATURE_PERIOD,
+                        default=options.get(CONF_TEMPERATURE_PERIOD, DEFAULT_TEMPERATURE_PERIOD),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                    vol.Optional(
+                        CONF_ACK_TIMEOUT,
+                        default=options.get(CONF_ACK_TIMEOUT, DEFAULT_ACK_TIMEOUT),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0.1)),
+                    vol.Optional(
+                        CONF_ACK_RETRIES,
+                        default=options.get(CONF_ACK_RETRIES, DEFAULT_ACK_RETRIES),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                    vol.Optional(
+                        CONF_AVAILABILITY_TIMEOUT,
+                        default=options.get(
+                            CONF_AVAILABILITY_TIMEOUT, DEFAULT_AVAILABILITY_TIMEOUT
+                        ),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                    vol.Optional(
+                        CONF_DEVICE_TTL,
+                        default=options.get(CONF_DEVICE_TTL, DEFAULT_DEVICE_TTL),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                    vol.Optional(
+                        CONF_MAX_DEVICES,
+                        default=options.get(CONF_MAX_DEVICES, DEFAULT_MAX_DEVICES),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                    vol.Optional(
+                        CONF_TOPIC_PREFIXES,
+                        default=options.get(CONF_TOPIC_PREFIXES, DEFAULT_TOPIC_PREFIXES),
+                    ): selector.TextSelector(selector.TextSelectorConfig(multiple=True)),
+                }
+            ),
+            errors=errors,
+        )
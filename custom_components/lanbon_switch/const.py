@@ -5,3 +5,52 @@ STATE_SUBTOPIC = "state"
 SET_SUBTOPIC = "set"
 THERMOSTAT_SUBTOPIC = "thermostat"
 MODE_STATE_SUBTOPIC = "modeState"
+TEMPERATURE_STATE_SUBTOPIC = "temperatureState"
+TEMPERATURE_DETECT_SUBTOPIC = "temperatureDetect"
+TEMPERATURE_SET_SUBTOPIC = "temperatureSet"
+MODE_SET_SUBTOPIC = "modeSet"
+# Subtopics the devices publish; the rest are our own commands echoed back
+STATE_SUBTOPICS = frozenset(
+    (STATE_SUBTOPIC, MODE_STATE_SUBTOPIC, TEMPERATURE_STATE_SUBTOPIC, TEMPERATURE_DETECT_SUBTOPIC)
+)
+
+DISCOVERY_BATCH_DELAY = 0.5
+
+CONF_SAVE_DELAY = "save_delay"
+DEFAULT_SAVE_DELAY = 10
+CONF_SYNC_TIMEOUT = "sync_timeout"
+DEFAULT_SYNC_TIMEOUT = 5
+CONF_SYNC_RATE = "sync_rate"
+DEFAULT_SYNC_RATE = 20
+CONF_SYNC_CONCURRENCY = "sync_concurrency"
+DEFAULT_SYNC_CONCURRENCY = 8
+CONF_TEMPERATURE_DEADBAND = "temperature_deadband"
+DEFAULT_TEMPERATURE_DEADBAND = 0.0
+CONF_TEMPERATURE_MIN_INTERVAL = "temperature_min_interval"
+DEFAULT_TEMPERATURE_MIN_INTERVAL = 0
+CONF_TEMPERATURE_PERIOD = "temperature_period"
+DEFAULT_TEMPERATURE_PERIOD = 0
+CONF_ACK_TIMEOUT = "ack_timeout"
+DEFAULT_ACK_TIMEOUT = 2
+CONF_ACK_RETRIES = "ack_retries"
+DEFAULT_ACK_RETRIES = 3
+CONF_AVAILABILITY_TIMEOUT = "availability_timeout"
+DEFAULT_AVAILABILITY_TIMEOUT = 600
+CONF_DEVICE_TTL = "device_ttl"
+DEFAULT_DEVICE_TTL = 30
+CONF_MAX_DEVICES = "max_devices"
+DEFAULT_MAX_DEVICES = 5000
+CONF_TOPIC_PREFIXES = "topic_prefixes"
+DEFAULT_TOPIC_PREFIXES = [TOPIC_PREFIX.rstrip("/")]
+
+SERVICE_BULK_SET = "bulk_set"
+ATTR_TARGETS = "targets"
+SERVICE_PROFILE = "profile"
+ATTR_DURATION = "duration"
+ATTR_SAMPLE_RATE = "sample_rate"
+ATTR_FILENAME = "filename"
+SERVICE_CAPTURE = "capture"
+ATTR_MAX_SIZE = "max_size"
+ATTR_BACKUPS = "backups"
+
+EVENT_SYNC_COMPLETE = f"{DOMAIN}_sync_complete"
@@ -0,0 +1,27 @@
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .registry import DEVICE_TYPES
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """Return the registry size, counters and handler metrics."""
+    data = hass.data[DOMAIN]
+    registry = data["registry"]
+    return {
+        "options": dict(entry.options),
+        "panels": {kind: len(registry.panels(kind)) for kind in DEVICE_TYPES},
+        "channels": {kind: sum(1 for _ in registry.channels(kind)) for kind in DEVICE_TYPES},
+        "routes": data["dispatcher"].route_count,
+        "discovery_batches": data["discovery"].batches,
+        "storage_writes": data["store"].write_count,
+        "sync": data["sync"].summary,
+        "stats": dict(data["stats"]),
+        "acks": data["acks"].as_dict(),
+        "commands": data["commands"].as_dict(),
+        "availability": data["availability"].as_dict(),
+        "evicted": data["eviction"].evicted,
+        "metrics": data["metrics"].as_dict(),
+        "profiling": data["metrics"].profiling,
+    }
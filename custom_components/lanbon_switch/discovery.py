@@ -0,0 +1,162 @@
+import asyncio
+import logging
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import (
+    DOMAIN,
+    SWITCH_SUBTOPIC,
+    STATE_SUBTOPIC,
+    THERMOSTAT_SUBTOPIC,
+    MODE_STATE_SUBTOPIC,
+    DISCOVERY_BATCH_DELAY,
+)
+from .panel import async_get_panel
+from .registry import CHANNEL_TYPES, Channel
+
+_LOGGER = logging.getLogger(__name__)
+
+ADD_ENTITIES_KEYS = {
+    SWITCH_SUBTOPIC: "add_switch_entities",
+    THERMOSTAT_SUBTOPIC: "add_climate_entities",
+}
+
+
+def _create_entity(hass: HomeAssistant, channel: Channel):
+    if channel.kind == SWITCH_SUBTOPIC:
+        from .switch import LANBONSwitch
+        return LANBONSwitch(hass, channel)
+    from .climate import LANBONThermostat
+    return LANBONThermostat(hass, channel)
+
+
+class LanbonDiscovery:
+    """Turn discovery messages into entities, in batches.
+
+    A channel is claimed in the registry synchronously when its first
+    message arrives, so retained duplicates that follow are dropped by the
+    topic lookup. New channels wait in a queue that is flushed once per
+    ``batch_delay``: one registry save and one ``async_add_entities`` call
+    per platform for the whole batch.
+
+    A platform that wasn't set up because no device of its type was known
+    is loaded by the first batch with one, and creates those entities
+    from the registry itself.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry | None = None,
+        batch_delay: float = DISCOVERY_BATCH_DELAY,
+    ):
+        self.hass = hass
+        self.entry = entry
+        self.batch_delay = batch_delay
+        self.batches = 0
+        self._queue: list[Channel] = []
+        self._cancel_flush: CALLBACK_TYPE | None = None
+        self._loading: set[asyncio.Task] = set()
+
+    @callback
+    def async_setup(self, dispatcher):
+        dispatcher.async_register_discovery(
+            SWITCH_SUBTOPIC, STATE_SUBTOPIC, self._discovered(SWITCH_SUBTOPIC)
+        )
+        dispatcher.async_register_discovery(
+            THERMOSTAT_SUBTOPIC, MODE_STATE_SUBTOPIC, self._discovered(THERMOSTAT_SUBTOPIC)
+        )
+
+    def _discovered(self, kind: str):
+        registry = self.hass.data[DOMAIN]["registry"]
+        metrics = self.hass.data[DOMAIN]["metrics"]
+
+        @callback
+        def handle(msg, prefix, device_id_raw, channel_id_raw):
+            # Known channels are found by their state topic
+            if registry.by_topic(msg.topic) is not None:
+                return
+            channel, created = registry.add(kind, device_id_raw, channel_id_raw, prefix)
+            if not created:
+                return
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug("Discovered %s %s on %s", kind, channel_id_raw, channel.route_id)
+            if kind == SWITCH_SUBTOPIC:
+                # The panel records the state this message carries
+                async_get_panel(self.hass, channel.panel).async_track_switch(channel)
+            self._queue.append(channel)
+            if self._cancel_flush is None:
+                self._cancel_flush = async_call_later(
+                    self.hass, self.batch_delay, self._async_flush
+                )
+
+        return metrics.wrap(f"discover_{kind}", handle)
+
+    @callback
+    def _async_flush(self, _now=None):
+        self._cancel_flush = None
+        queue, self._queue = self._queue, []
+        if not queue:
+            return
+
+        self.batches += 1
+        self.hass.data[DOMAIN]["store"].async_mark_dirty()
+        self.hass.data[DOMAIN]["eviction"].async_check_cap()
+
+        new_entities = {}
+        for channel in queue:
+            new_entities.setdefault(channel.kind, []).append(channel)
+
+        for kind, channels in new_entities.items():
+            add_entities = self.hass.data[DOMAIN].get(ADD_ENTITIES_KEYS[kind])
+            if add_entities is None:
+                # The platform creates them from the registry when it sets up
+                self._async_load_platform(kind)
+                continue
+            add_entities([_create_entity(self.hass, channel) for channel in channels])
+        _LOGGER.debug("Added %d discovered channels", len(queue))
+
+    @callback
+    def _async_load_platform(self, kind: str):
+        platforms = self.hass.data[DOMAIN]["platforms"]
+        platform = CHANNEL_TYPES[kind].platform
+        if self.entry is None or platform in platforms:
+            return
+        platforms.add(platform)
+        _LOGGER.debug("Loading the %s platform for the first %s", platform, kind)
+        task = self.hass.async_create_task(
+            self.hass.config_entries.async_forward_entry_setups(self.entry, [platform])
+        )
+        self._loading.add(task)
+        task.add_done_callback(self._loading.discard)
+
+    @callback
+    def async_drop_queued(self, kind: str):
+        """Forget queued channels of ``kind``, which its platform just created.
+
+        A platform loaded on demand builds its entities from the registry,
+        which already holds every channel claimed while it was loading.
+        """
+        queue = [channel for channel in self._queue if channel.kind != kind]
+        if len(queue) < len(self._queue):
+            # The flush may find nothing left to save
+            self.hass.data[DOMAIN]["store"].async_mark_dirty()
+        self._queue = queue
+
+    async def async_wait_platforms(self):
+        """Wait for platforms still being loaded, so they can be unloaded."""
+        if self._loading:
+            await asyncio.gather(*self._loading, return_exceptions=True)
+
+    @callback
+    def async_shutdown(self):
+        """Cancel the pending flush; queued channels are already in the registry."""
+        if self._cancel_flush is not None:
+            self._cancel_flush()
+            self._cancel_flush = None
+        if self._queue:
+            # Still have them saved by the store's flush on unload
+            self.hass.data[DOMAIN]["store"].async_mark_dirty()
+        self._queue.clear()
@@ -0,0 +1,135 @@
+import logging
+from typing import Callable
+
+from homeassistant.components import mqtt
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .const import (
+    TOPIC_PREFIX,
+    SWITCH_SUBTOPIC,
+    STATE_SUBTOPIC,
+    THERMOSTAT_SUBTOPIC,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class LanbonDispatcher:
+    """Route LANBON MQTT traffic from one shared subscription set.
+
+    Everything after the topic prefix has a fixed layout, so splitting a
+    topic from the right leaves its whole prefix as one string, resolved
+    by a single dict lookup however many prefixes there are. The message is
+    then handed to the entity handler its device's ``LanbonPanel`` keeps
+    for ``(channel_id_raw, subtopic)`` and to the discovery handler
+    registered for ``(kind, subtopic)``, all via dict lookups.
+
+    Device IDs under a prefix other than the default one are qualified with
+    it, as in ``building-a/D6925E1A7741``: see ``registry.route_id``.
+    """
+
+    def __init__(self, hass: HomeAssistant, prefixes=(TOPIC_PREFIX,)):
+        self.hass = hass
+        self.prefixes = tuple(dict.fromkeys(f"{prefix.strip('/')}/" for prefix in prefixes))
+        # Prefix without its trailing slash -> (prefix, device ID qualifier)
+        self._prefix_lookup = {
+            prefix[:-1]: (prefix, "" if prefix == TOPIC_PREFIX else prefix)
+            for prefix in self.prefixes
+        }
+        self._routes: dict[str, dict[tuple[str, str], Callable]] = {}
+        self._discovery: dict[tuple[str, str], Callable] = {}
+        self._listeners: list[Callable] = []
+        self._unsubscribe: list[CALLBACK_TYPE] = []
+
+    @property
+    def route_count(self) -> int:
+        return len(self._routes)
+
+    async def async_subscribe(self):
+        """Subscribe to the switch and thermostat wildcards of every prefix."""
+        topics = [
+            topic
+            for prefix in self.prefixes
+            for topic in (
+                f"{prefix}+/{SWITCH_SUBTOPIC}/+/{STATE_SUBTOPIC}",
+                f"{prefix}+/{THERMOSTAT_SUBTOPIC}/+/+",
+            )
+        ]
+        for topic in topics:
+            self._unsubscribe.append(
+                # Handlers parse the raw bytes; see payloads.py
+                await mqtt.async_subscribe(
+                    self.hass, topic, self.async_dispatch, qos=0, encoding=None
+                )
+            )
+        _LOGGER.debug("Subscribed to MQTT topics: %s", topics)
+
+    @callback
+    def async_unsubscribe(self):
+        while self._unsubscribe:
+            self._unsubscribe.pop()()
+
+    @callback
+    def async_register(
+        self, device_id_raw: str, handlers: dict[tuple[str, str], Callable]
+    ) -> CALLBACK_TYPE:
+        """Route messages for one device through ``handlers``.
+
+        ``handlers`` maps ``(channel_id_raw, subtopic)`` to a handler and is
+        kept up to date by its owner, so channels come and go without
+        touching the dispatcher.
+        """
+        self._routes[device_id_raw] = handlers
+
+        @callback
+        def unregister():
+            if self._routes.get(device_id_raw) is handlers:
+                del self._routes[device_id_raw]
+
+        return unregister
+
+    @callback
+    def async_register_discovery(self, kind: str, subtopic: str, handler: Callable):
+        """Call ``handler(msg, prefix, device_id_raw, channel_id_raw)`` for ``kind``/``subtopic``.
+
+        ``device_id_raw`` is the bare ID from the topic here.
+        """
+        self._discovery[(kind, subtopic)] = handler
+
+    @callback
+    def async_add_listener(self, listener: Callable) -> CALLBACK_TYPE:
+        """Call ``listener(device_id_raw, channel_id_raw, subtopic, msg)`` for every message."""
+        self._listeners.append(listener)
+
+        @callback
+        def remove():
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+        return remove
+
+    @callback
+    def async_dispatch(self, msg):
+        parts = msg.topic.rsplit("/", 4)
+        leaf = self._prefix_lookup.get(parts[0])
+        if leaf is None or len(parts) != 5:
+            _LOGGER.error("Invalid topic structure: %s", msg.topic)
+            return
+
+        _, device_id_raw, kind, channel_id_raw, subtopic = parts
+        prefix, namespace = leaf
+        route_id = namespace + device_id_raw
+
+        for listener in self._listeners:
+            listener(route_id, channel_id_raw, subtopic, msg)
+
+        # First, so a channel discovered by this message gets its state too
+        discover = self._discovery.get((kind, subtopic))
+        if discover is not None:
+            discover(msg, prefix, device_id_raw, channel_id_raw)
+
+        handlers = self._routes.get(route_id)
+        if handlers is not None:
+            handler = handlers.get((channel_id_raw, subtopic))
+            if handler is not None:
+                handler(msg)
@@ -0,0 +1,144 @@
+import heapq
+import logging
+import time
+from datetime import timedelta
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import DOMAIN, DEFAULT_DEVICE_TTL, DEFAULT_MAX_DEVICES
+from .registry import Panel
+
+_LOGGER = logging.getLogger(__name__)
+
+SWEEP_INTERVAL = timedelta(hours=1)
+
+
+class LanbonEviction:
+    """Forget devices that stopped publishing, and cap the registry size.
+
+    Last-seen times are taken from the shared message flow and saved with
+    the registry, at most once per sweep. Devices silent for longer than
+    ``ttl`` seconds are evicted; if more than ``max_devices`` remain, the
+    least recently seen go too. Each sweep removes its devices from the
+    registry, the entity and device registries and storage in one batch.
+
+    Silence only counts while the integration runs: a device is never
+    older than the time its eviction started, so Home Assistant being down
+    or restored from an old backup doesn't evict the whole fleet at boot.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        ttl: float = DEFAULT_DEVICE_TTL * 86400,
+        max_devices: int = DEFAULT_MAX_DEVICES,
+    ):
+        self.hass = hass
+        # Seconds; the option is in days
+        self.ttl = ttl
+        self.max_devices = max_devices
+        self.evicted = 0
+        self._started = time.time()
+        self._unsubscribe: list[CALLBACK_TYPE] = []
+
+    @callback
+    def async_setup(self, dispatcher):
+        registry = self.hass.data[DOMAIN]["registry"]
+
+        @callback
+        def message_received(device_id_raw, channel_id_raw, subtopic, msg):
+            channel = registry.by_topic(msg.topic)
+            if channel is not None:
+                channel.panel.last_seen = time.time()
+
+        self._unsubscribe.append(dispatcher.async_add_listener(message_received))
+        self._unsubscribe.append(
+            async_track_time_interval(self.hass, self._async_periodic_sweep, SWEEP_INTERVAL)
+        )
+
+    @callback
+    def async_shutdown(self):
+        while self._unsubscribe:
+            self._unsubscribe.pop()()
+
+    @callback
+    def _async_periodic_sweep(self, _now=None):
+        if not self.async_sweep():
+            # Persist the last-seen times even when nothing was evicted
+            self.hass.data[DOMAIN]["store"].async_mark_dirty()
+
+    @callback
+    def async_check_cap(self):
+        """Sweep if discovery took the registry over ``max_devices``."""
+        if self.max_devices and self.hass.data[DOMAIN]["registry"].panel_count > self.max_devices:
+            self.async_sweep()
+
+    @callback
+    def async_sweep(self) -> int:
+        """Evict expired devices and any over the cap; return how many."""
+        registry = self.hass.data[DOMAIN]["registry"]
+        stale = []
+        cutoff = time.time() - self.ttl
+        if self.ttl and cutoff > self._started:
+            stale = [panel for panel in registry.panels() if panel.last_seen < cutoff]
+
+        excess = registry.panel_count - len(stale) - self.max_devices
+        if self.max_devices and excess > 0:
+            expired = set(stale)
+            stale.extend(
+                heapq.nsmallest(
+                    excess,
+                    (panel for panel in registry.panels() if panel not in expired),
+                    key=lambda panel: panel.last_seen,
+                )
+            )
+
+        if stale:
+            self._async_evict(stale)
+        return len(stale)
+
+    @callback
+    def async_forget(self, panel: Panel) -> list:
+        """Drop ``panel`` from the registry and all per-device state.
+
+        Returns its channels. The entity and device registries are left to
+        the caller, e.g. Home Assistant when a device is deleted in the UI.
+        """
+        data = self.hass.data[DOMAIN]
+        channels = data["registry"].remove(panel)
+        data["availability"].async_forget(panel.route_id)
+        data["acks"].async_forget(panel.route_id)
+        data["commands"].async_forget(panel.route_id)
+        coordinator = data.get("panels", {}).pop(panel.route_id, None)
+        if coordinator is not None:
+            coordinator.async_remove()
+        data["store"].async_mark_dirty()
+        return channels
+
+    @callback
+    def _async_evict(self, panels: list[Panel]):
+        entity_registry = er.async_get(self.hass)
+        device_registry = dr.async_get(self.hass)
+
+        for panel in panels:
+            channels = self.async_forget(panel)
+            device = device_registry.async_get_device(identifiers={(DOMAIN, panel.device_id)})
+            if device is not None:
+                # Takes the device's entities with it
+                device_registry.async_remove_device(device.id)
+            for channel in channels:
+                entity_id = entity_registry.async_get_entity_id(
+                    channel.platform, DOMAIN, channel.unique_id
+                )
+                if entity_id is not None:
+                    entity_registry.async_remove(entity_id)
+
+        self.evicted += len(panels)
+        _LOGGER.info(
+            "Evicted %d LANBON devices: %s",
+            len(panels),
+            ", ".join(panel.route_id for panel in panels[:20]),
+        )
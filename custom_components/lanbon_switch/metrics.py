@@ -0,0 +1,176 @@
+import cProfile
+import functools
+import logging
+import time
+from bisect import bisect_left
+from typing import Callable
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.event import async_call_later
+
+_LOGGER = logging.getLogger(__name__)
+
+DISCOVER_SWITCH = "discover_switch"
+DISCOVER_THERMOSTAT = "discover_thermostat"
+SWITCH_MESSAGE_RECEIVED = "switch_message_received"
+THERMOSTAT_MESSAGE_RECEIVED = "thermostat_message_received"
+PUBLISH_SWITCH = "publish_switch"
+PUBLISH_THERMOSTAT = "publish_thermostat"
+
+HANDLERS = (
+    DISCOVER_SWITCH,
+    DISCOVER_THERMOSTAT,
+    SWITCH_MESSAGE_RECEIVED,
+    THERMOSTAT_MESSAGE_RECEIVED,
+    PUBLISH_SWITCH,
+    PUBLISH_THERMOSTAT,
+)
+
+# Upper bounds of the latency histogram buckets, in microseconds
+LATENCY_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000)
+
+
+class HandlerMetrics:
+    """Call count and latency histogram of one handler."""
+
+    __slots__ = ("calls", "errors", "total", "max", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record(self, seconds: float):
+        self.calls += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds * 1e6)] += 1
+
+    def percentile(self, fraction: float) -> float | None:
+        """Return the upper bound in µs of the bucket holding ``fraction`` of the calls."""
+        if not self.calls:
+            return None
+        threshold = fraction * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if seen >= threshold:
+                return min(float(bound), round(self.max * 1e6, 1))
+        return round(self.max * 1e6, 1)
+
+    def as_dict(self) -> dict:
+        histogram = {f"le_{bound}": count for bound, count in zip(LATENCY_BUCKETS, self.buckets)}
+        histogram["inf"] = self.buckets[-1]
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "mean_us": round(self.total / self.calls * 1e6, 1) if self.calls else None,
+            "p50_us": self.percentile(0.5),
+            "p90_us": self.percentile(0.9),
+            "p99_us": self.percentile(0.99),
+            "max_us": round(self.max * 1e6, 1),
+            "histogram": histogram,
+        }
+
+
+class _Timer:
+    __slots__ = ("_metrics", "_start")
+
+    def __init__(self, metrics: HandlerMetrics):
+        self._metrics = metrics
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self._metrics.errors += 1
+        self._metrics.record(time.perf_counter() - self._start)
+
+
+class LanbonMetrics:
+    """Counters and latency histograms for the MQTT hot paths.
+
+    Message callbacks are wrapped with ``wrap``, publishes are timed with
+    ``timer``. While a profile is running, every ``sample_rate``-th wrapped
+    callback also runs under cProfile.
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        self.hass = hass
+        self.handlers: dict[str, HandlerMetrics] = {name: HandlerMetrics() for name in HANDLERS}
+        self._profile: cProfile.Profile | None = None
+        self._profile_path: str | None = None
+        self._sample_rate = 1
+        self._sampled = 0
+        self._cancel_profile: CALLBACK_TYPE | None = None
+
+    @property
+    def profiling(self) -> bool:
+        return self._profile is not None
+
+    def handler(self, name: str) -> HandlerMetrics:
+        metrics = self.handlers.get(name)
+        if metrics is None:
+            metrics = self.handlers[name] = HandlerMetrics()
+        return metrics
+
+    def timer(self, name: str) -> _Timer:
+        """Return a context manager that records the time spent in its block."""
+        return _Timer(self.handler(name))
+
+    def wrap(self, name: str, func: Callable) -> Callable:
+        """Return ``func`` recording its calls under ``name``."""
+        metrics = self.handler(name)
+
+        @functools.wraps(func)
+        def timed(*args):
+            start = time.perf_counter()
+            try:
+                if self._profile is not None and self._sample():
+                    return self._profile.runcall(func, *args)
+                return func(*args)
+            except Exception:
+                metrics.errors += 1
+                raise
+            finally:
+                metrics.record(time.perf_counter() - start)
+
+        return timed
+
+    def _sample(self) -> bool:
+        self._sampled += 1
+        return self._sampled % self._sample_rate == 0
+
+    @callback
+    def async_start_profile(self, path: str, duration: float, sample_rate: int = 1):
+        """Profile the wrapped callbacks for ``duration`` seconds, then write ``path``."""
+        if self._profile is not None:
+            raise HomeAssistantError(f"A profile is already being written to {self._profile_path}")
+        _LOGGER.info("Profiling LANBON callbacks for %s s into %s", duration, path)
+        self._profile = cProfile.Profile()
+        self._profile_path = path
+        self._sample_rate = max(1, sample_rate)
+        self._sampled = 0
+        self._cancel_profile = async_call_later(self.hass, duration, self._async_stop_profile)
+
+    async def _async_stop_profile(self, _now=None):
+        self._cancel_profile = None
+        profile, self._profile = self._profile, None
+        if profile is None:
+            return
+        await self.hass.async_add_executor_job(profile.dump_stats, self._profile_path)
+        _LOGGER.info("Wrote LANBON profile to %s", self._profile_path)
+
+    async def async_shutdown(self):
+        """Write a running profile early, e.g. when the entry is unloaded."""
+        if self._cancel_profile is not None:
+            self._cancel_profile()
+            await self._async_stop_profile()
+
+    def as_dict(self) -> dict:
+        return {name: metrics.as_dict() for name, metrics in self.handlers.items()}
@@ -0,0 +1,145 @@
+from typing import Callable
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.entity import DeviceInfo
+
+from .const import DOMAIN, STATE_SUBTOPIC, SWITCH_SUBTOPIC
+from .metrics import SWITCH_MESSAGE_RECEIVED
+from .payloads import SWITCH_STATES
+from .registry import Panel, SwitchChannel
+
+MODELS = {SWITCH_SUBTOPIC: "Switch panel"}
+
+
+class LanbonPanel:
+    """Coordinate the entities of one physical device.
+
+    The panel takes a single dispatcher route and a single availability
+    listener for the device and fans them out to its channel entities, so
+    both scale with devices rather than channels. The route is the panel's
+    own handler dict, which the dispatcher looks into directly.
+
+    The panel also records the reported state of every switch channel from
+    its own route, with or without an entity listening, so gang 4 reads
+    gang 1's from here even when gang 1's entity is disabled.
+    """
+
+    def __init__(self, hass: HomeAssistant, panel: Panel):
+        self.hass = hass
+        self.route_id = panel.route_id
+        self.device_info = DeviceInfo(
+            identifiers={(DOMAIN, panel.device_id)},
+            manufacturer="LANBON",
+            model=MODELS.get(panel.kind, "Thermostat"),
+            name=f"LANBON {panel.route_id}",
+        )
+        # Lower-case channel ID -> last known "ON"/"OFF"
+        self.switch_states: dict[str, str | None] = {}
+        self._handlers: dict[tuple[str, str], Callable] = {}
+        # Lower-case channel ID -> listener(changed) of its switch entity
+        self._switch_listeners: dict[str, Callable[[bool], None]] = {}
+        self._entities: list = []
+        self._remove_route: CALLBACK_TYPE | None = None
+        self._remove_availability: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_register(self, channel_id_raw: str, subtopic: str, handler: Callable) -> CALLBACK_TYPE:
+        """Route messages for one channel subtopic to ``handler``."""
+        key = (channel_id_raw, subtopic)
+        self._handlers[key] = handler
+        if self._remove_route is None:
+            self._remove_route = self.hass.data[DOMAIN]["dispatcher"].async_register(
+                self.route_id, self._handlers
+            )
+
+        @callback
+        def unregister():
+            if self._handlers.get(key) is handler:
+                del self._handlers[key]
+            if not self._handlers and self._remove_route is not None:
+                self._remove_route()
+                self._remove_route = None
+
+        return unregister
+
+    @callback
+    def async_track_switch(self, channel: SwitchChannel):
+        """Record ``channel``'s reported state from now on."""
+        channel_id = channel.channel_id
+        if channel_id in self.switch_states:
+            return
+        self.switch_states[channel_id] = None
+        if channel.is_gang4:
+            # Gang 4 never reports its state, its entity's is optimistic
+            return
+
+        @callback
+        def state_received(msg):
+            state = SWITCH_STATES.get(msg.payload)
+            if state is None:
+                return
+            changed = state != self.switch_states[channel_id]
+            self.switch_states[channel_id] = state
+            listener = self._switch_listeners.get(channel_id)
+            if listener is not None:
+                listener(changed)
+
+        self.async_register(
+            channel.channel_id_raw,
+            STATE_SUBTOPIC,
+            self.hass.data[DOMAIN]["metrics"].wrap(SWITCH_MESSAGE_RECEIVED, state_received),
+        )
+
+    @callback
+    def async_listen_switch(self, channel_id: str, listener: Callable[[bool], None]) -> CALLBACK_TYPE:
+        """Call ``listener(changed)`` after each state ``channel_id`` reports."""
+        self._switch_listeners[channel_id] = listener
+
+        @callback
+        def remove():
+            if self._switch_listeners.get(channel_id) is listener:
+                del self._switch_listeners[channel_id]
+
+        return remove
+
+    @callback
+    def async_remove(self):
+        """Stop routing the device's messages, e.g. when it is evicted."""
+        self._handlers.clear()
+        if self._remove_route is not None:
+            self._remove_route()
+            self._remove_route = None
+
+    @callback
+    def async_add_entity(self, entity) -> CALLBACK_TYPE:
+        """Write ``entity``'s state when the device expires or recovers."""
+        self._entities.append(entity)
+        if self._remove_availability is None:
+            self._remove_availability = self.hass.data[DOMAIN]["availability"].async_register(
+                self.route_id, self._async_availability_changed
+            )
+
+        @callback
+        def remove():
+            if entity in self._entities:
+                self._entities.remove(entity)
+            if not self._entities and self._remove_availability is not None:
+                self._remove_availability()
+                self._remove_availability = None
+
+        return remove
+
+    @callback
+    def _async_availability_changed(self):
+        for entity in list(self._entities):
+            entity.async_write_ha_state()
+
+
+@callback
+def async_get_panel(hass: HomeAssistant, panel: Panel) -> LanbonPanel:
+    """Return the coordinator of ``panel``'s device, creating it if needed."""
+    panels = hass.data[DOMAIN].setdefault("panels", {})
+    coordinator = panels.get(panel.route_id)
+    if coordinator is None:
+        coordinator = panels[panel.route_id] = LanbonPanel(hass, panel)
+    return coordinator
@@ -0,0 +1,33 @@
+from functools import lru_cache
+
+# The dispatcher subscribes with encoding=None, so handlers get bytes.
+# Known values map straight to the strings the entities keep.
+SWITCH_STATES = {b"ON": "ON", b"OFF": "OFF"}
+THERMOSTAT_MODES = {b"off": "off", b"auto": "auto"}
+
+# The payload a device echoes for each state we send
+SWITCH_STATE_PAYLOADS = {state: payload for payload, state in SWITCH_STATES.items()}
+THERMOSTAT_MODE_PAYLOADS = {mode: payload for payload, mode in THERMOSTAT_MODES.items()}
+
+
+# A fleet only ever reports a few hundred distinct temperatures
+@lru_cache(maxsize=1024)
+def parse_float(payload: bytes) -> float | None:
+    """Return the payload as a float, or None if it isn't one."""
+    try:
+        return float(payload)
+    except ValueError:
+        return None
+
+
+def parse_mode(payload: bytes) -> str:
+    """Return the thermostat mode, decoding modes we don't know by name."""
+    mode = THERMOSTAT_MODES.get(payload)
+    if mode is None:
+        mode = payload.decode("utf-8", "replace")
+    return mode
+
+
+def text(payload: bytes) -> str:
+    """Decode a payload for a log message."""
+    return payload.decode("utf-8", "replace")
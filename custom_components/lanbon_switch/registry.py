@@ -0,0 +1,384 @@
+import logging
+import time
+from sys import intern
+
+from .const import (
+    TOPIC_PREFIX,
+    SWITCH_SUBTOPIC,
+    STATE_SUBTOPIC,
+    SET_SUBTOPIC,
+    THERMOSTAT_SUBTOPIC,
+    MODE_STATE_SUBTOPIC,
+    TEMPERATURE_STATE_SUBTOPIC,
+    TEMPERATURE_DETECT_SUBTOPIC,
+    TEMPERATURE_SET_SUBTOPIC,
+    MODE_SET_SUBTOPIC,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+DEVICE_TYPES = (SWITCH_SUBTOPIC, THERMOSTAT_SUBTOPIC)
+
+
+def _topic(prefix: str, device_id_raw: str, kind: str, channel_id_raw: str, subtopic: str) -> str:
+    return f"{prefix}{device_id_raw}/{kind}/{channel_id_raw}/{subtopic}"
+
+
+def route_id(prefix: str, device_id_raw: str) -> str:
+    """Return the device ID qualified with its topic prefix.
+
+    Devices under the default prefix keep their bare ID, so their entities,
+    storage keys and routes are the same as with a single prefix.
+    """
+    if prefix == TOPIC_PREFIX:
+        return device_id_raw
+    return f"{prefix}{device_id_raw}"
+
+
+class Panel:
+    """A physical LANBON device and its channels of one kind.
+
+    ``device_id_raw`` is the ID in the device's topics. ``route_id`` is the
+    ID qualified with the topic prefix; the dispatcher, the entities and
+    storage know the device by it, and ``device_id`` is its lowercase form.
+    """
+
+    __slots__ = (
+        "kind",
+        "prefix",
+        "device_id",
+        "device_id_raw",
+        "route_id",
+        "channels",
+        "last_seen",
+    )
+
+    def __init__(
+        self,
+        kind: str,
+        device_id_raw: str,
+        last_seen: float | None = None,
+        prefix: str = TOPIC_PREFIX,
+    ):
+        self.kind = kind
+        self.prefix = intern(prefix)
+        self.device_id_raw = intern(device_id_raw)
+        self.route_id = intern(route_id(prefix, device_id_raw))
+        self.device_id = intern(self.route_id.lower())
+        self.channels: dict[str, "Channel"] = {}
+        # Wall-clock time of the last message, kept across restarts for eviction
+        self.last_seen = last_seen if last_seen is not None else time.time()
+
+
+class Channel:
+    """One switch gang or thermostat on a panel."""
+
+    __slots__ = ("panel", "channel_id", "channel_id_raw", "entity")
+
+    kind = None
+    platform = None
+    unique_id_prefix = None
+
+    def __init__(self, panel: Panel, channel_id_raw: str):
+        self.panel = panel
+        self.channel_id_raw = intern(channel_id_raw)
+        self.channel_id = intern(channel_id_raw.lower())
+        # The entity bound to this channel once it is added to Home Assistant
+        self.entity = None
+
+    @property
+    def device_id(self) -> str:
+        return self.panel.device_id
+
+    @property
+    def device_id_raw(self) -> str:
+        return self.panel.device_id_raw
+
+    @property
+    def route_id(self) -> str:
+        return self.panel.route_id
+
+    @property
+    def unique_id(self) -> str:
+        return f"{self.unique_id_prefix}_{self.panel.device_id}_{self.channel_id}"
+
+    def state_topics(self) -> tuple[str, ...]:
+        """Topics the channel reports on, used for lookups by topic."""
+        raise NotImplementedError
+
+    def as_dict(self) -> dict:
+        raise NotImplementedError
+
+
+class SwitchChannel(Channel):
+    __slots__ = ("state_topic", "set_topic", "gang1_id")
+
+    kind = SWITCH_SUBTOPIC
+    platform = "switch"
+    unique_id_prefix = "lanbon_switch"
+
+    def __init__(self, panel: Panel, channel_id_raw: str):
+        super().__init__(panel, channel_id_raw)
+        prefix = panel.prefix
+        device_id_raw = panel.device_id_raw
+        self.state_topic = _topic(
+            prefix, device_id_raw, SWITCH_SUBTOPIC, channel_id_raw, STATE_SUBTOPIC
+        )
+        self.set_topic = _topic(
+            prefix, device_id_raw, SWITCH_SUBTOPIC, channel_id_raw, SET_SUBTOPIC
+        )
+        self.gang1_id = None
+        if self.channel_id.endswith("-04"):
+            # The L8-HS4 workaround drives gang 4 through gang 1
+            self.gang1_id = intern(self.channel_id.replace("-04", "-01"))
+
+    @property
+    def is_gang4(self) -> bool:
+        return self.gang1_id is not None
+
+    @property
+    def gang1(self) -> "SwitchChannel | None":
+        if self.gang1_id is None:
+            return None
+        return self.panel.channels.get(self.gang1_id)
+
+    def _gang1_topic(self, subtopic: str) -> str | None:
+        if self.gang1_id is None:
+            return None
+        return _topic(
+            self.panel.prefix,
+            self.panel.device_id_raw,
+            SWITCH_SUBTOPIC,
+            self.channel_id_raw.replace("-04", "-01"),
+            subtopic,
+        )
+
+    @property
+    def gang1_set_topic(self) -> str | None:
+        gang1 = self.gang1
+        if gang1 is not None:
+            return gang1.set_topic
+        return self._gang1_topic(SET_SUBTOPIC)
+
+    @property
+    def gang1_state_topic(self) -> str | None:
+        gang1 = self.gang1
+        if gang1 is not None:
+            return gang1.state_topic
+        return self._gang1_topic(STATE_SUBTOPIC)
+
+    def state_topics(self):
+        return (self.state_topic,)
+
+    def as_dict(self):
+        return {
+            "prefix": self.panel.prefix,
+            "device_id_raw": self.panel.device_id_raw,
+            "switch_id_raw": self.channel_id_raw,
+            "set_topic": self.set_topic,
+        }
+
+
+class ThermostatChannel(Channel):
+    __slots__ = (
+        "temperature_state_topic",
+        "temperature_detect_topic",
+        "mode_state_topic",
+        "temperature_set_topic",
+        "mode_set_topic",
+    )
+
+    kind = THERMOSTAT_SUBTOPIC
+    platform = "climate"
+    unique_id_prefix = "lanbon_thermostat"
+
+    def __init__(self, panel: Panel, channel_id_raw: str):
+        super().__init__(panel, channel_id_raw)
+        prefix = panel.prefix
+        device_id_raw = panel.device_id_raw
+        self.temperature_state_topic = _topic(
+            prefix, device_id_raw, THERMOSTAT_SUBTOPIC, channel_id_raw, TEMPERATURE_STATE_SUBTOPIC
+        )
+        self.temperature_detect_topic = _topic(
+            prefix, device_id_raw, THERMOSTAT_SUBTOPIC, channel_id_raw, TEMPERATURE_DETECT_SUBTOPIC
+        )
+        self.mode_state_topic = _topic(
+            prefix, device_id_raw, THERMOSTAT_SUBTOPIC, channel_id_raw, MODE_STATE_SUBTOPIC
+        )
+        self.temperature_set_topic = _topic(
+            prefix, device_id_raw, THERMOSTAT_SUBTOPIC, channel_id_raw, TEMPERATURE_SET_SUBTOPIC
+        )
+        self.mode_set_topic = _topic(
+            prefix, device_id_raw, THERMOSTAT_SUBTOPIC, channel_id_raw, MODE_SET_SUBTOPIC
+        )
+
+    def state_topics(self):
+        return (
+            self.temperature_state_topic,
+            self.temperature_detect_topic,
+            self.mode_state_topic,
+        )
+
+    def as_dict(self):
+        return {
+            "prefix": self.panel.prefix,
+            "device_id_raw": self.panel.device_id_raw,
+            "thermostat_id_raw": self.channel_id_raw,
+            "temperature_state_topic": self.temperature_state_topic,
+            "temperature_detect_topic": self.temperature_detect_topic,
+            "mode_state_topic": self.mode_state_topic,
+            "temperature_set_topic": self.temperature_set_topic,
+            "mode_set_topic": self.mode_set_topic,
+        }
+
+
+CHANNEL_TYPES = {SWITCH_SUBTOPIC: SwitchChannel, THERMOSTAT_SUBTOPIC: ThermostatChannel}
+RAW_ID_KEYS = {SWITCH_SUBTOPIC: "switch_id_raw", THERMOSTAT_SUBTOPIC: "thermostat_id_raw"}
+
+
+class LanbonRegistry:
+    """The integration's single source of truth for panels and channels.
+
+    Every topic is built once when a channel is added, and channels can be
+    found in O(1) by kind and IDs, by any topic they report on, or by the
+    entity ID of the entity bound to them.
+    """
+
+    def __init__(self):
+        self._panels: dict[str, dict[str, Panel]] = {kind: {} for kind in DEVICE_TYPES}
+        self._by_topic: dict[str, Channel] = {}
+        self._by_entity_id: dict[str, Channel] = {}
+
+    def __len__(self) -> int:
+        return sum(len(panel.channels) for panel in self.panels())
+
+    @property
+    def panel_count(self) -> int:
+        return sum(len(panels) for panels in self._panels.values())
+
+    def panels(self, kind: str | None = None):
+        if kind is not None:
+            return self._panels[kind].values()
+        return (panel for panels in self._panels.values() for panel in panels.values())
+
+    def panel(self, kind: str, device_id: str) -> Panel | None:
+        return self._panels[kind].get(device_id)
+
+    def channels(self, kind: str):
+        for panel in self._panels[kind].values():
+            yield from panel.channels.values()
+
+    def get(self, kind: str, device_id: str, channel_id: str) -> Channel | None:
+        panel = self._panels[kind].get(device_id)
+        if panel is None:
+            return None
+        return panel.channels.get(channel_id)
+
+    def by_topic(self, topic: str) -> Channel | None:
+        return self._by_topic.get(topic)
+
+    def by_entity_id(self, entity_id: str) -> Channel | None:
+        return self._by_entity_id.get(entity_id)
+
+    def add(
+        self,
+        kind: str,
+        device_id_raw: str,
+        channel_id_raw: str,
+        prefix: str = TOPIC_PREFIX,
+    ) -> tuple[Channel, bool]:
+        """Return the channel for the given IDs and whether it was created."""
+        panels = self._panels[kind]
+        device_id = route_id(prefix, device_id_raw).lower()
+        panel = panels.get(device_id)
+        if panel is None:
+            panel = Panel(kind, device_id_raw, prefix=prefix)
+            panels[panel.device_id] = panel
+
+        channel = panel.channels.get(channel_id_raw.lower())
+        if channel is not None:
+            return channel, False
+
+        channel = CHANNEL_TYPES[kind](panel, channel_id_raw)
+        panel.channels[channel.channel_id] = channel
+        for topic in channel.state_topics():
+            self._by_topic[topic] = channel
+        return channel, True
+
+    def remove(self, panel: Panel) -> list[Channel]:
+        """Forget ``panel`` and return its channels."""
+        self._panels[panel.kind].pop(panel.device_id, None)
+        channels = list(panel.channels.values())
+        for channel in channels:
+            for topic in channel.state_topics():
+                self._by_topic.pop(topic, None)
+            if channel.entity is not None and channel.entity.entity_id:
+                self._by_entity_id.pop(channel.entity.entity_id, None)
+        return channels
+
+    def bind(self, channel: Channel, entity):
+        """Attach the entity created for ``channel``."""
+        channel.entity = entity
+        if entity.entity_id:
+            self._by_entity_id[entity.entity_id] = channel
+
+    def unbind(self, channel: Channel):
+        entity = channel.entity
+        channel.entity = None
+        if entity is not None and entity.entity_id:
+            self._by_entity_id.pop(entity.entity_id, None)
+
+    def as_dict(self) -> dict:
+        """Serialize to the JSON-safe ``{kind: {device_id: {channel_id: info}}}`` layout."""
+        return {
+            kind: {
+                device_id: {
+                    channel_id: channel.as_dict()
+                    for channel_id, channel in panel.channels.items()
+                }
+                for device_id, panel in panels.items()
+            }
+            for kind, panels in self._panels.items()
+        }
+
+    def last_seen_as_dict(self) -> dict:
+        """Return ``{kind: {device_id: last_seen}}``, rounded to the second."""
+        return {
+            kind: {device_id: round(panel.last_seen) for device_id, panel in panels.items()}
+            for kind, panels in self._panels.items()
+        }
+
+    @classmethod
+    def from_dict(cls, devices: dict, last_seen: dict | None = None) -> "LanbonRegistry":
+        registry = cls()
+        if not isinstance(devices, dict):
+            devices = {}
+        if not isinstance(last_seen, dict):
+            last_seen = {}
+        for kind, raw_id_key in RAW_ID_KEYS.items():
+            stored = devices.get(kind)
+            for channels in stored.values() if isinstance(stored, dict) else ():
+                if not isinstance(channels, dict):
+                    _LOGGER.warning("Skipping invalid stored %s device: %s", kind, channels)
+                    continue
+                for info in channels.values():
+                    if not isinstance(info, dict):
+                        ids = None
+                    else:
+                        ids = (
+                            info.get("device_id_raw"),
+                            info.get(raw_id_key),
+                            info.get("prefix", TOPIC_PREFIX),
+                        )
+                    # Checked up front, so a bad entry leaves no empty panel behind
+                    if ids is None or not all(isinstance(value, str) for value in ids):
+                        _LOGGER.warning("Skipping invalid stored %s: %s", kind, info)
+                        continue
+                    registry.add(kind, *ids)
+            # Devices stored before last-seen times were kept count as seen now
+            seen_times = last_seen.get(kind)
+            for device_id, seen in seen_times.items() if isinstance(seen_times, dict) else ():
+                panel = registry.panel(kind, device_id)
+                if panel is not None and isinstance(seen, (int, float)):
+                    panel.last_seen = seen
+        return registry
@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from homeassistant.components.sensor import SensorEntity, SensorStateClass
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .const import DOMAIN
+from .metrics import HANDLERS, HandlerMetrics
+
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+# The counters are read on a poll, never written from the hot paths
+SCAN_INTERVAL = timedelta(seconds=60)
+
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback):
+    """Set up the diagnostic metric sensors."""
+    metrics = hass.data[DOMAIN]["metrics"]
+    async_add_entities(
+        LanbonMetricSensor(name, metrics.handler(name)) for name in HANDLERS
+    )
+
+class LanbonMetricSensor(SensorEntity):
+    """Calls of one instrumented handler, with its latency as attributes."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_native_unit_of_measurement = "calls"
+
+    def __init__(self, handler_name: str, metrics: HandlerMetrics):
+        self._metrics = metrics
+        self._attr_unique_id = f"{DOMAIN}_metrics_{handler_name}"
+        self._attr_name = f"LANBON {handler_name.replace('_', ' ')}"
+
+    @property
+    def native_value(self):
+        return self._metrics.calls
+
+    @property
+    def extra_state_attributes(self):
+        metrics = self._metrics.as_dict()
+        del metrics["histogram"]
+        return metrics
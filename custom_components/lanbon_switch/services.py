@@ -0,0 +1,168 @@
+import logging
+import time
+
+import voluptuous as vol
+
+from homeassistant.const import ATTR_DEVICE_ID, ATTR_ENTITY_ID, ATTR_STATE
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse, callback
+import homeassistant.helpers.config_validation as cv
+
+from .const import (
+    DOMAIN,
+    SWITCH_SUBTOPIC,
+    SERVICE_BULK_SET,
+    ATTR_TARGETS,
+    SERVICE_PROFILE,
+    ATTR_DURATION,
+    ATTR_SAMPLE_RATE,
+    ATTR_FILENAME,
+    SERVICE_CAPTURE,
+    ATTR_MAX_SIZE,
+    ATTR_BACKUPS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+TARGET_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+            vol.Optional(ATTR_DEVICE_ID): vol.All(cv.ensure_list, [cv.string]),
+            vol.Required(ATTR_STATE): vol.All(vol.Upper, vol.In(["ON", "OFF"])),
+        }
+    ),
+    cv.has_at_least_one_key(ATTR_ENTITY_ID, ATTR_DEVICE_ID),
+)
+
+BULK_SET_SCHEMA = vol.Schema(
+    {vol.Required(ATTR_TARGETS): vol.All(cv.ensure_list, [TARGET_SCHEMA])}
+)
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_DURATION, default=30): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=3600)
+        ),
+        vol.Optional(ATTR_SAMPLE_RATE, default=1): vol.All(vol.Coerce(int), vol.Range(min=1)),
+        vol.Optional(ATTR_FILENAME): vol.All(cv.string, vol.Match(r"^[\w.-]+$")),
+    }
+)
+
+CAPTURE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_DURATION, default=600): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=86400)
+        ),
+        vol.Optional(ATTR_FILENAME): vol.All(cv.string, vol.Match(r"^[\w.-]+$")),
+        # MiB per file
+        vol.Optional(ATTR_MAX_SIZE, default=100): vol.All(vol.Coerce(int), vol.Range(min=1)),
+        vol.Optional(ATTR_BACKUPS, default=5): vol.All(vol.Coerce(int), vol.Range(min=0, max=100)),
+    }
+)
+
+
+@callback
+def async_setup_services(hass: HomeAssistant):
+    """Register the integration's services."""
+
+    async def async_bulk_set(call: ServiceCall):
+        """Set many switch channels, handling each panel in one pass."""
+        start = time.monotonic()
+        registry = hass.data[DOMAIN]["registry"]
+        targets = {}
+
+        for target in call.data[ATTR_TARGETS]:
+            state = target[ATTR_STATE]
+            for entity_id in target.get(ATTR_ENTITY_ID, []):
+                channel = registry.by_entity_id(entity_id)
+                if channel is None or channel.kind != SWITCH_SUBTOPIC:
+                    _LOGGER.warning("Unknown LANBON switch: %s", entity_id)
+                    continue
+                targets[channel.entity] = state
+            for device_id in target.get(ATTR_DEVICE_ID, []):
+                panel = registry.panel(SWITCH_SUBTOPIC, device_id.lower())
+                if panel is None:
+                    _LOGGER.warning("Unknown LANBON device: %s", device_id)
+                    continue
+                for channel in panel.channels.values():
+                    if channel.entity is not None:
+                        targets[channel.entity] = state
+
+        commands = []
+        for entity, state in targets.items():
+            entity.async_track_command(state)
+            commands.append(entity.build_command(state))
+        results = await hass.data[DOMAIN]["commands"].async_set_many(commands)
+
+        failed = 0
+        for entity, result in zip(targets, results):
+            if isinstance(result, BaseException):
+                failed += 1
+            else:
+                entity.async_set_state(result)
+
+        duration = time.monotonic() - start
+        panels = len({device_id_raw for device_id_raw, _, _ in commands})
+        _LOGGER.debug(
+            "Bulk set %d channels on %d panels in %.3f s (%d failed)",
+            len(commands),
+            panels,
+            duration,
+            failed,
+        )
+        return {
+            "channels": len(commands),
+            "panels": panels,
+            "failed": failed,
+            "duration": round(duration, 3),
+        }
+
+    async def async_profile(call: ServiceCall):
+        """Profile the MQTT callbacks for a while and write a cProfile file."""
+        filename = call.data.get(ATTR_FILENAME) or f"{DOMAIN}_profile_{int(time.time())}.prof"
+        path = hass.config.path(filename)
+        hass.data[DOMAIN]["metrics"].async_start_profile(
+            path, call.data[ATTR_DURATION], call.data[ATTR_SAMPLE_RATE]
+        )
+        return {ATTR_FILENAME: path, ATTR_DURATION: call.data[ATTR_DURATION]}
+
+    async def async_capture(call: ServiceCall):
+        """Record the MQTT traffic for a while, for replay with benchmarks/replay.py."""
+        filename = call.data.get(ATTR_FILENAME) or f"{DOMAIN}_{int(time.time())}.cap"
+        path = hass.config.path(filename)
+        await hass.data[DOMAIN]["capture"].async_start(
+            path,
+            call.data[ATTR_DURATION],
+            call.data[ATTR_MAX_SIZE] * 1024 * 1024,
+            call.data[ATTR_BACKUPS],
+        )
+        return {ATTR_FILENAME: path, ATTR_DURATION: call.data[ATTR_DURATION]}
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_BULK_SET,
+        async_bulk_set,
+        schema=BULK_SET_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE,
+        async_profile,
+        schema=PROFILE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_CAPTURE,
+        async_capture,
+        schema=CAPTURE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+
+@callback
+def async_unload_services(hass: HomeAssistant):
+    hass.services.async_remove(DOMAIN, SERVICE_BULK_SET)
+    hass.services.async_remove(DOMAIN, SERVICE_PROFILE)
+    hass.services.async_remove(DOMAIN, SERVICE_CAPTURE)
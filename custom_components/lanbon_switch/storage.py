@@ -0,0 +1,102 @@
+import logging
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, DEFAULT_SAVE_DELAY
+from .registry import DEVICE_TYPES, LanbonRegistry
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 2
+STORAGE_KEY = f"{DOMAIN}_devices"
+
+
+def empty_registry() -> dict:
+    """Return an empty stored device mapping.
+
+    The layout is ``{device_type: {device_id: {channel_id: channel_info}}}``
+    so that every key is a string and survives the JSON round trip.
+    """
+    return {device_type: {} for device_type in DEVICE_TYPES}
+
+
+def migrate_v1(old_data: dict) -> dict:
+    """Convert version 1 data, whose devices were keyed by tuples.
+
+    Tuple keys never survived serialization, so the device type is
+    recovered from each channel entry rather than from its key.
+    """
+    devices = empty_registry()
+    for channels in (old_data or {}).get("devices", {}).values():
+        if not isinstance(channels, dict):
+            continue
+        for channel_id, info in channels.items():
+            if not isinstance(info, dict) or "device_id_raw" not in info:
+                continue
+            device_id = info["device_id_raw"].lower()
+            if "switch_id_raw" in info:
+                device_type = "switch"
+            elif "thermostat_id_raw" in info:
+                device_type = "thermostat"
+            else:
+                continue
+            devices[device_type].setdefault(device_id, {})[channel_id] = info
+    return {"devices": devices}
+
+
+class _LanbonStore(Store):
+    async def _async_migrate_func(self, old_major_version, old_minor_version, old_data):
+        if old_major_version == 1:
+            _LOGGER.info("Migrating LANBON device registry from version 1")
+            return migrate_v1(old_data)
+        raise NotImplementedError
+
+
+class LanbonStorage:
+    """Persist the device registry with coalesced, delayed writes.
+
+    Discovery only marks the registry dirty. The snapshot is taken when the
+    delayed write fires, so a burst of new channels costs a single write.
+    ``Store`` also writes any pending data on Home Assistant's final write.
+    """
+
+    def __init__(self, hass: HomeAssistant, save_delay: float = DEFAULT_SAVE_DELAY):
+        self.hass = hass
+        self.save_delay = save_delay
+        self.write_count = 0
+        self._store = _LanbonStore(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._dirty = False
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    async def async_load(self) -> LanbonRegistry:
+        """Load the registry from disk, migrating older layouts."""
+        stored_data = await self._store.async_load() or {}
+        return LanbonRegistry.from_dict(
+            stored_data.get("devices", {}), stored_data.get("last_seen")
+        )
+
+    @callback
+    def async_mark_dirty(self):
+        """Schedule a write of the registry, coalescing with any pending one."""
+        if self._dirty:
+            return
+        self._dirty = True
+        self._store.async_delay_save(self._data_to_save, self.save_delay)
+
+    async def async_flush(self):
+        """Write pending changes now, e.g. when the entry is unloaded."""
+        if self._dirty:
+            await self._store.async_save(self._data_to_save())
+
+    @callback
+    def _data_to_save(self) -> dict:
+        self._dirty = False
+        self.write_count += 1
+        registry = self.hass.data[DOMAIN]["registry"]
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Saving %d known channels", len(registry))
+        return {"devices": registry.as_dict(), "last_seen": registry.last_seen_as_dict()}
@@ -1,11 +1,14 @@
-import asyncio
-from homeassistant.components import mqtt
 from homeassistant.components.switch import SwitchEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.restore_state import RestoreEntity
 
-from .const import DOMAIN, TOPIC_PREFIX, SWITCH_SUBTOPIC
+from .commands import SwitchCommand
+from .const import DOMAIN, SWITCH_SUBTOPIC, STATE_SUBTOPIC
+from .panel import async_get_panel
+from .payloads import SWITCH_STATE_PAYLOADS
+from .registry import SwitchChannel
 
 import logging
 
@@ -13,149 +16,155 @@ _LOGGER = logging.getLogger(__name__)
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback):
     """Set up switches for a config entry."""
-    known_devices = hass.data[DOMAIN].get("known_devices", {})
+    registry = hass.data[DOMAIN]["registry"]
     entities = []
-
-    for device_id, switches in known_devices.items():
-        for switch_id, switch_info in switches.items():
-            topic_state = f"{TOPIC_PREFIX}{switch_info['device_id_raw']}/{SWITCH_SUBTOPIC}/{switch_info['switch_id_raw']}/state"
-            _LOGGER.debug("Adding entity for device: %s, switch: %s", device_id, switch_id)
-            entities.append(
-                LANBONSwitch(
-                    hass,
-                    device_id,
-                    switch_id,
-                    switch_info["device_id_raw"],
-                    switch_info["switch_id_raw"],
-                    topic_state,
-                    switch_info["set_topic"],
-                )
-            )
-    async_add_entities(entities, update_before_add=True)
+    debug = _LOGGER.isEnabledFor(logging.DEBUG)
+
+    for channel in registry.channels(SWITCH_SUBTOPIC):
+        if debug:
+            _LOGGER.debug("Adding entity for device: %s, switch: %s", channel.device_id, channel.channel_id)
+        entities.append(LANBONSwitch(hass, channel))
+    # State arrives over MQTT, there is nothing to poll before adding
+    async_add_entities(entities)
     # Store the callback for dynamic addition
-    hass.data[DOMAIN]["add_entities"] = async_add_entities
-
-class LANBONSwitch(SwitchEntity):
-    def __init__(
-        self,
-        hass: HomeAssistant,
-        device_id: str,
-        switch_id: str,
-        device_id_raw: str,
-        switch_id_raw: str,
-        topic_state: str,
-        topic_set: str
-    ):
+    hass.data[DOMAIN]["add_switch_entities"] = async_add_entities
+    # Channels discovery still has queued were just created from the registry
+    discovery = hass.data[DOMAIN].get("discovery")
+    if discovery is not None:
+        discovery.async_drop_queued(SWITCH_SUBTOPIC)
+
+class LANBONSwitch(SwitchEntity, RestoreEntity):
+    def __init__(self, hass: HomeAssistant, channel: SwitchChannel):
         self.hass = hass
-        self._device_id = device_id
-        self._switch_id = switch_id
-        self._device_id_raw = device_id_raw
-        self._switch_id_raw = switch_id_raw
-        self._topic_state = topic_state
-        self._topic_set = topic_set
-        self._unsubscribe = None
-
-        # Initialize state
-        self._state = None
-
-        # Identify if this is gang4
-        self._is_gang4 = self._switch_id.endswith('-04')
-
-        if self._is_gang4:
-            # Compute gang1's identifiers by replacing '-04' with '-01'
-            self._gang1_switch_id_raw = self._switch_id_raw.replace('-04', '-01')
-            self._gang1_switch_id = self._switch_id.replace('-04', '-01')
-            self._gang1_topic_set = f"{TOPIC_PREFIX}{self._device_id_raw}/{SWITCH_SUBTOPIC}/{self._gang1_switch_id_raw}/set"
-            self._gang1_entity_id = f"switch.lanbon_switch_{self._device_id}_switch_{self._gang1_switch_id.replace('-', '_')}"
+        self._channel = channel
+        self._panel = async_get_panel(hass, channel.panel)
+        self._panel.async_track_switch(channel)
+        self.suppressed_writes = 0
 
     @property
     def unique_id(self):
-        return f"lanbon_switch_{self._device_id}_{self._switch_id}"
+        return self._channel.unique_id
+
+    @property
+    def device_info(self):
+        return self._panel.device_info
+
+    # The panel keeps the state, so gang 4 can read gang 1's
+    @property
+    def _state(self):
+        return self._panel.switch_states[self._channel.channel_id]
+
+    @_state.setter
+    def _state(self, state):
+        self._panel.switch_states[self._channel.channel_id] = state
 
     @property
     def name(self):
-        return f"LANBON Switch {self._device_id_raw} Switch {self._switch_id_raw}"
+        return f"LANBON Switch {self._channel.route_id} Switch {self._channel.channel_id_raw}"
 
     @property
     def is_on(self):
         return self._state == "ON"
 
-    async def async_turn_on(self, **kwargs):
-        if self._is_gang4:
-            gang1_state = self.hass.states.get(self._gang1_entity_id).state.upper()
+    @property
+    def available(self):
+        return self.hass.data[DOMAIN]["availability"].is_available(self._channel.route_id)
+
+    def _gang1_state(self):
+        return self._panel.switch_states.get(self._channel.gang1_id)
+
+    def build_command(self, state):
+        """Return the scheduler arguments that set this channel to ``state``."""
+        channel = self._channel
+        if channel.is_gang4:
+            command = SwitchCommand(
+                channel.set_topic,
+                state,
+                channel.gang1_id,
+                channel.gang1_set_topic,
+                self._gang1_state,
+                channel.gang1_state_topic,
+            )
+        else:
+            command = SwitchCommand(channel.set_topic, state)
+        return channel.route_id, channel.channel_id, command
 
-            # Turn on gang4
-            await mqtt.async_publish(self.hass, self._topic_set, "ON", qos=0, retain=False)
-            await asyncio.sleep(0.01)
+    @callback
+    def async_set_state(self, state):
+        self._state = state
+        self.async_write_ha_state()
 
-            # Turn on gang1
-            await mqtt.async_publish(self.hass, self._gang1_topic_set, "ON", qos=0, retain=False)
-            await asyncio.sleep(0.01)
+    @callback
+    def async_track_command(self, state):
+        """Resend ``state`` until the panel echoes it, or roll it back.
 
-            # Turn off gang4
-            await mqtt.async_publish(self.hass, self._topic_set, "OFF", qos=0, retain=False)
-            await asyncio.sleep(0.01)
+        Gang 4 never reports its state, so its commands stay optimistic.
+        """
+        channel = self._channel
+        if channel.is_gang4:
+            return
+        previous = self._state
 
-            # Back to original state gang1
-            await mqtt.async_publish(self.hass, self._gang1_topic_set, gang1_state, qos=0, retain=False)
+        @callback
+        def rollback():
+            if self._state == state:
+                self.async_set_state(previous)
+
+        self.hass.data[DOMAIN]["acks"].async_track(
+            channel.route_id,
+            channel.channel_id_raw,
+            STATE_SUBTOPIC,
+            SWITCH_STATE_PAYLOADS[state].__eq__,
+            lambda: self.hass.data[DOMAIN]["commands"].async_set(*self.build_command(state)),
+            rollback,
+        )
+
+    async def _async_send(self, state):
+        self.async_track_command(state)
+        # The panel's queue may merge this with a later command for the same gang
+        self.async_set_state(
+            await self.hass.data[DOMAIN]["commands"].async_set(*self.build_command(state))
+        )
 
-            # Update state
-            self._state = "ON"
-            self.async_write_ha_state()
-        else:
-            # Regular behavior for other gangs
-            await mqtt.async_publish(self.hass, self._topic_set, "ON", qos=0, retain=False)
-            # Update state
-            self._state = "ON"
-            self.async_write_ha_state()
+    async def async_turn_on(self, **kwargs):
+        await self._async_send("ON")
 
     async def async_turn_off(self, **kwargs):
-        if self._is_gang4:
-            # Check initial state of gang1
-            gang1_state = self.hass.states.get(self._gang1_entity_id)
-            gang1_is_on = gang1_state.state == 'on' if gang1_state else False
-
-            # Turn on gang4
-            await mqtt.async_publish(self.hass, self._topic_set, "ON", qos=0, retain=False)
-            await asyncio.sleep(0.3)
-
-            # Turn off gang1
-            await mqtt.async_publish(self.hass, self._gang1_topic_set, "OFF", qos=0, retain=False)
-            await asyncio.sleep(0.1)
-
-            # Turn off gang4
-            await mqtt.async_publish(self.hass, self._topic_set, "OFF", qos=0, retain=False)
-            await asyncio.sleep(0.3)
-
-            if gang1_is_on:
-                # If gang1 was originally on, turn it back on
-                await mqtt.async_publish(self.hass, self._gang1_topic_set, "ON", qos=0, retain=False)
-
-            # Update state
-            self._state = "OFF"
-            self.async_write_ha_state()
-        else:
-            # Regular behavior for other gangs
-            await mqtt.async_publish(self.hass, self._topic_set, "OFF", qos=0, retain=False)
-            # Update state
-            self._state = "OFF"
-            self.async_write_ha_state()
+        await self._async_send("OFF")
+
+    def _probe(self):
+        # Re-assert the restored state so the panel echoes its current one.
+        # Gang 4 is skipped: its state is never reported and setting it needs
+        # the gang-1 toggle cycle.
+        if self._channel.is_gang4 or self._state is None:
+            return None
+        return self.hass.data[DOMAIN]["commands"].async_set(*self.build_command(self._state))
 
     async def async_added_to_hass(self):
+        last_state = await self.async_get_last_state()
+        # A state the panel already reported is fresher
+        if self._state is None and last_state is not None and last_state.state in ("on", "off"):
+            self._state = last_state.state.upper()
+
         @callback
-        def message_received(msg):
-            payload = msg.payload
-            if payload in ["ON", "OFF"]:
-                if not self._is_gang4:
-                    self._state = payload
-                    self.async_write_ha_state()
-                else:
-                    # Ignore state updates for gang4
-                    pass
-
-        self._unsubscribe = await mqtt.async_subscribe(self.hass, self._topic_state, message_received, qos=0)
+        def state_received(changed):
+            # The panel has recorded the state already
+            if changed:
+                self.async_write_ha_state()
+            else:
+                # Panels re-publish their state periodically
+                self.suppressed_writes += 1
+                self.hass.data[DOMAIN]["stats"]["switch_suppressed_writes"] += 1
+
+        channel = self._channel
+        self.async_on_remove(self._panel.async_listen_switch(channel.channel_id, state_received))
+        self.async_on_remove(self._panel.async_add_entity(self))
+        self.hass.data[DOMAIN]["registry"].bind(channel, self)
+        self.async_on_remove(
+            self.hass.data[DOMAIN]["sync"].async_register(
+                channel.route_id, channel.channel_id_raw, self._probe
+            )
+        )
 
     async def async_will_remove_from_hass(self):
-        if self._unsubscribe:
-            self._unsubscribe()
-            self._unsubscribe = None
+        self.hass.data[DOMAIN]["registry"].unbind(self._channel)
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .const import (
+    EVENT_SYNC_COMPLETE,
+    DEFAULT_SYNC_TIMEOUT,
+    DEFAULT_SYNC_RATE,
+    DEFAULT_SYNC_CONCURRENCY,
+    STATE_SUBTOPICS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Allow ``rate`` acquisitions per second with bursts of up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    async def async_acquire(self):
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class LanbonStateSync:
+    """Bring channel states up to date after startup without changing them.
+
+    Retained state messages are collected first. Only channels that stay
+    silent for ``timeout`` seconds are probed, by re-asserting the state
+    their entity restored, with bounded concurrency and a token-bucket rate.
+    A probe is a real command: it switches back a channel changed by hand
+    while Home Assistant was down. A ``concurrency`` of 0 only hydrates.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        timeout: float = DEFAULT_SYNC_TIMEOUT,
+        rate: float = DEFAULT_SYNC_RATE,
+        concurrency: int = DEFAULT_SYNC_CONCURRENCY,
+    ):
+        self.hass = hass
+        self.timeout = timeout
+        self.rate = rate
+        self.concurrency = concurrency
+        self._probes: dict[tuple[str, str], Callable[[], Awaitable | None]] = {}
+        self._reported: set[tuple[str, str]] = set()
+        self._all_reported: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._remove_listener: CALLBACK_TYPE | None = None
+        self.summary: dict | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @callback
+    def async_setup(self, dispatcher):
+        """Start collecting reports; retained messages arrive before the sync runs."""
+        self._remove_listener = dispatcher.async_add_listener(self.async_message_received)
+
+    @callback
+    def async_start(self):
+        """Run the sync in the background, once Home Assistant has started."""
+        self._task = self.hass.async_create_background_task(
+            self.async_run(), "lanbon_switch state sync"
+        )
+
+    @callback
+    def async_shutdown(self):
+        if self._remove_listener is not None:
+            self._remove_listener()
+            self._remove_listener = None
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    @callback
+    def async_register(
+        self, device_id_raw: str, channel_id_raw: str, probe: Callable[[], Awaitable | None]
+    ) -> CALLBACK_TYPE:
+        """Register a channel; ``probe`` returns an awaitable or None to skip."""
+        key = (device_id_raw, channel_id_raw)
+        self._probes[key] = probe
+
+        @callback
+        def unregister():
+            if self._probes.get(key) is probe:
+                del self._probes[key]
+
+        return unregister
+
+    @callback
+    def async_message_received(self, device_id_raw, channel_id_raw, subtopic, msg):
+        if subtopic not in STATE_SUBTOPICS:
+            # A thermostat probe's own modeSet comes back on the wildcard
+            return
+        key = (device_id_raw, channel_id_raw)
+        if key in self._probes and key not in self._reported:
+            self._reported.add(key)
+            if self._all_reported is not None and self._reported.issuperset(self._probes):
+                self._all_reported.set()
+
+    async def _async_wait_for_reports(self):
+        self._all_reported = asyncio.Event()
+        if self._reported.issuperset(self._probes):
+            return
+        try:
+            await asyncio.wait_for(self._all_reported.wait(), self.timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def async_run(self) -> dict:
+        """Run the sync and fire ``EVENT_SYNC_COMPLETE`` with its summary."""
+        start = time.monotonic()
+        try:
+            await self._async_wait_for_reports()
+            hydrated = len(self._reported)
+
+            silent = [key for key in self._probes if key not in self._reported]
+            if not self.concurrency:
+                # Hydrate only: silent channels keep their restored state
+                silent = []
+            bucket = TokenBucket(self.rate)
+            semaphore = asyncio.Semaphore(self.concurrency)
+            counts = {"probed": 0, "skipped": 0, "failed": 0}
+
+            async def async_probe(key):
+                async with semaphore:
+                    probe = self._probes.get(key)
+                    awaitable = probe() if probe is not None else None
+                    if awaitable is None:
+                        counts["skipped"] += 1
+                        return
+                    await bucket.async_acquire()
+                    try:
+                        await awaitable
+                    except Exception as err:  # pylint: disable=broad-except
+                        _LOGGER.warning("State probe for %s/%s failed: %s", *key, err)
+                        counts["failed"] += 1
+                    else:
+                        counts["probed"] += 1
+
+            await asyncio.gather(*(async_probe(key) for key in silent))
+            if counts["probed"]:
+                await self._async_wait_for_reports()
+        finally:
+            self._all_reported = None
+
+        self.summary = {
+            "channels": len(self._probes),
+            "hydrated": hydrated,
+            **counts,
+            "silent": len(self._probes) - len(self._reported),
+            "duration": round(time.monotonic() - start, 3),
+        }
+        _LOGGER.info("LANBON state sync finished: %s", self.summary)
+        self.hass.bus.async_fire(EVENT_SYNC_COMPLETE, self.summary)
+        return self.summary